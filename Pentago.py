@@ -28,6 +28,21 @@ import random
 import copy
 import sys, getopt
 import time
+import struct
+import mmap
+import os
+import zlib
+import hashlib
+try:
+	import fcntl
+except ImportError:
+	fcntl = None    # no file locking (Windows): only one writer at a time
+import itertools
+import importlib
+import threading
+import queue
+import multiprocessing
+import concurrent.futures
 import numpy as np
 
 #--------------------------------------------------------------------------------
@@ -116,30 +131,66 @@ def twoChoices(question,option1,option2):
 #  Allows game to begin with particular initial state, with Player 1 to 
 #  play first.
 #    python3 Pentago_base.py -b "w.b.bw.w.b.wb.w..wb....w...bw.bbb.ww"
+#
+#  Search limits for computer players can be given on the command line:
+#    python3 Pentago_base.py -t 2000 -n 100000 -d 6 -w 4 -s -p
+#  (-t/--movetime milliseconds per move, -n/--nodes per move, -d/--depth,
+#  -w/--workers processes to search with, -s/--stats to show search
+#  statistics, --timing to also time the parts of the search, -p/--ponder
+#  to search during the opponent's turn, --book to use an opening book,
+#  --ttfile to keep the transposition table in a file between games,
+#  --ttsize for the number of indexes of the table in memory), or
+#  as "key=value" lines after the player lines of the config file:
+#    movetime=2000
+#
+#  With --record file (or record=file in the config), the game is appended
+#  to a binary game record file (see records.py) instead of being written
+#  to a transcript file.
+#
+#  Returns the board, the players and the settings.
 #----------------------------------------------------------------------------
 def gameSetup(timestamp):
 	pb = PentagoBoard()
 	setupDone = False
 
 	player = [ None for i in range(2) ]
+	settings = { }
 	
-	opts, args = getopt.getopt(sys.argv[1:],"b:c:",["board=","config="])
+	opts, args = getopt.getopt(sys.argv[1:],"b:c:t:n:d:w:sp", \
+	               ["board=","config=","movetime=","nodes=","depth=","workers=", \
+	                "stats","timing","ponder","book=","ttfile=","ttsize=","record="])
 	for opt, arg in opts:
 		if opt in ("-b", "--board"):
 			initialState = arg
 			pb = PentagoBoard(arg)
 		elif opt in ("-c", "--config"):
 			print("Reading setup from " + arg + ":")
-			f = open(arg, "r")
-			info = f.read().splitlines()
-			f.close() 
-
-			playerName,playerType,playerToken,  \
-			  opponentName,opponentType,opponentToken = info
-
-			player[0] = Player(playerName,playerType,playerToken)
-			player[1] = Player(opponentName,opponentType,opponentToken)			  
+			player, fileSettings = readConfig(arg)
+			for key in fileSettings:
+				settings.setdefault(key, fileSettings[key])
 			setupDone = True
+		elif opt in ("-t", "--movetime"):
+			settings["movetime"] = arg
+		elif opt in ("-n", "--nodes"):
+			settings["nodes"] = arg
+		elif opt in ("-d", "--depth"):
+			settings["depth"] = arg
+		elif opt in ("-w", "--workers"):
+			settings["workers"] = arg
+		elif opt in ("-s", "--stats"):
+			settings["stats"] = "1"
+		elif opt=="--timing":
+			settings["stats"] = "timing"
+		elif opt in ("-p", "--ponder"):
+			settings["ponder"] = "1"
+		elif opt=="--book":
+			settings["book"] = arg
+		elif opt=="--ttfile":
+			settings["ttfile"] = arg
+		elif opt=="--ttsize":
+			settings["ttsize"] = arg
+		elif opt=="--record":
+			settings["record"] = arg
 		else:
 			print("Unknown option, " + opt + " " + arg )
 			
@@ -172,11 +223,57 @@ def gameSetup(timestamp):
 				
 		player[1] = Player(playerName,playerType,opponentToken)
 		f.write(playerName + "\n" + playerType + "\n" + opponentToken + "\n")
+		for key in settings:
+			f.write(key + "=" + settings[key] + "\n")
 		f.close()
+
+	for p in player:
+		p.configure(settings)
 		
-	return pb, player
+	return pb, player, settings
 		
 
+#----------------------------------------------------------------------------
+#  Player types of the config file's type line, besides human and computer:
+#  type -> (module, class).  A module is only imported when its type is used,
+#  and its class is a Player subclass playing as a computer player.
+#----------------------------------------------------------------------------
+PLAYER_TYPES = {
+  "mcts": ("mcts", "MCTSPlayer"),
+}
+
+def makePlayer(name, playerType, token):
+	if playerType.lower() in PLAYER_TYPES:
+		moduleName, className = PLAYER_TYPES[playerType.lower()]
+		playerClass = getattr(importlib.import_module(moduleName), className)
+		return playerClass(name, "computer", token)
+	return Player(name, playerType, token)
+
+
+#----------------------------------------------------------------------------
+#  Reads a config file: name, type and token of each player, one per line,
+#  then optional "key=value" search settings (see Player.configure).
+#  Returns the two players and a dictionary of the settings, which have
+#  not been applied to the players yet.
+#----------------------------------------------------------------------------
+def readConfig(fileName):
+	f = open(fileName, "r")
+	info = f.read().splitlines()
+	f.close() 
+
+	playerName,playerType,playerToken,  \
+	  opponentName,opponentType,opponentToken = info[:6]
+	settings = { }
+	for line in info[6:]:
+		if "=" in line:
+			key, value = line.split("=", 1)
+			settings[key.strip().lower()] = value.strip()
+
+	player = [ makePlayer(playerName,playerType,playerToken),
+	           makePlayer(opponentName,opponentType,opponentToken) ]
+	return player, settings
+
+
 #-----------------------------------------------------------------------
 # names for common abbreviations
 #-----------------------------------------------------------------------
@@ -187,8 +284,433 @@ descr = {
   "c": "computer"
 }
 
-#USED FOR CHECKING IF THE BOARD WAS ACTUALLY ROTATED IN THE WIN
-didRotr=True
+#--------------------------------------------------------------------------------
+# Bitboard tables:
+# A bitboard holds one bit per cell.  Cells are numbered block by block,
+# bit 9*(gameBlock-1) + (position-1), so every 3x3 subgrid is a run of 9
+# consecutive bits, and rotating a subgrid is a lookup of its 9-bit pattern.
+#--------------------------------------------------------------------------------
+NUM_CELLS = 36
+FULL_MASK = (1 << NUM_CELLS) - 1
+BLOCK_MASK = [ 0x1FF << (9*k) for k in range(4) ]
+
+# CELL_INDEX[i][j] is the bit of row i, column j; CELL_ROW_COL is its inverse.
+CELL_INDEX = [ [ 9*((i//3)*2 + j//3) + (i%3)*3 + j%3 for j in range(6) ] \
+               for i in range(6) ]
+CELL_ROW_COL = [ None ] * NUM_CELLS
+for _i in range(6):
+	for _j in range(6):
+		CELL_ROW_COL[CELL_INDEX[_i][_j]] = (_i, _j)
+
+# Bits in row-major order, the order used by toString() and getMoves().
+SCAN_ORDER = [ CELL_INDEX[i][j] for i in range(6) for j in range(6) ]
+
+def rotatePattern(pattern, clockwise):
+#---------------------------------------------------------------------------
+# Rotate the 9-bit pattern of a single subgrid a quarter turn.
+#---------------------------------------------------------------------------
+	rotated = 0
+	for p in range(9):
+		if (pattern >> p) & 1:
+			r, c = divmod(p, 3)
+			if clockwise:
+				rotated |= 1 << (c*3 + 2-r)
+			else:
+				rotated |= 1 << ((2-c)*3 + r)
+	return rotated
+
+# ROTATE_LEFT[k][pattern] / ROTATE_RIGHT[k][pattern] give the rotated pattern,
+# already shifted into place for block k (0..3).
+ROTATE_LEFT = [ [ rotatePattern(p, False) << (9*k) for p in range(512) ] \
+                for k in range(4) ]
+ROTATE_RIGHT = [ [ rotatePattern(p, True) << (9*k) for p in range(512) ] \
+                 for k in range(4) ]
+
+def rotateBits(bits, gameBlock, clockwise):
+#---------------------------------------------------------------------------
+# Rotate gameBlock (1..4) of a bitboard.
+#---------------------------------------------------------------------------
+	k = gameBlock - 1
+	table = ROTATE_RIGHT[k] if clockwise else ROTATE_LEFT[k]
+	return (bits & ~BLOCK_MASK[k]) | table[(bits >> (9*k)) & 0x1FF]
+
+#--------------------------------------------------------------------------------
+# Win lines:
+# The 32 ways to get 5 in a row on a 6x6 board (12 horizontal, 12 vertical,
+# 8 diagonal), each as a bitboard mask.
+#--------------------------------------------------------------------------------
+def lineMask(cells):
+	mask = 0
+	for i, j in cells:
+		mask |= 1 << CELL_INDEX[i][j]
+	return mask
+
+WIN_MASKS = [ ]
+for _i in range(6):
+	for _j in range(2):
+		WIN_MASKS.append(lineMask([ (_i, _j+n) for n in range(5) ]))
+		WIN_MASKS.append(lineMask([ (_j+n, _i) for n in range(5) ]))
+for _i in range(2):
+	for _j in range(2):
+		WIN_MASKS.append(lineMask([ (_i+n, _j+n) for n in range(5) ]))
+		WIN_MASKS.append(lineMask([ (_i+n, 5-_j-n) for n in range(5) ]))
+
+def hasFive(bits):
+#---------------------------------------------------------------------------
+# True if the bitboard contains 5 in a row.
+#---------------------------------------------------------------------------
+	if bin(bits).count("1") < 5:
+		return False
+	for mask in WIN_MASKS:
+		if bits & mask == mask:
+			return True
+	return False
+
+def winningCells(bits, empty):
+#---------------------------------------------------------------------------
+# Bitboard of the empty cells that would give bits 5 in a row.
+#---------------------------------------------------------------------------
+	cells = 0
+	if bin(bits).count("1") < 4:
+		return cells
+	for mask in WIN_MASKS:
+		missing = mask & ~bits
+		if missing & empty and missing & (missing-1) == 0:
+			cells |= missing
+	return cells
+
+# ROTATED_WIN_MASKS[r]: the win lines as they are before rotation r, the low
+# 3 bits of a move code (2*(gameBlock-1), plus 1 if clockwise).  A move with
+# rotation r gives a color 5 in a row when its stones, with the new one,
+# cover one of these.
+ROTATED_WIN_MASKS = [ [ rotateBits(mask, r//2 + 1, r%2==0) for mask in WIN_MASKS ] \
+                      for r in range(8) ]
+
+def winningMove(mine, theirs, empty):
+#---------------------------------------------------------------------------
+# A move code that wins at once for the color with stones mine, or None:
+# a placement that makes 5 in a row, or else a placement and rotation after
+# which mine has 5 in a row and theirs has not.
+#---------------------------------------------------------------------------
+	cells = winningCells(mine, empty)
+	if cells:
+		return CELL_MOVES[(cells & -cells).bit_length() - 1][0]
+	if bin(mine).count("1") < 4:
+		return None
+	for r in range(8):
+		if hasFive(rotateBits(theirs, r//2 + 1, r%2==1)):
+			continue
+		for mask in ROTATED_WIN_MASKS[r]:
+			missing = mask & ~mine
+			if missing==0:
+				# the rotation alone makes the line; any placement will do
+				missing = empty
+			elif missing & (missing-1) or not missing & empty:
+				continue
+			return 8*((missing & -missing).bit_length() - 1) + r
+	return None
+
+def findWinnerBits(black, white):
+#---------------------------------------------------------------------------
+# Returns "b" or "w" for a single winner, "tie" if both colors have 5 in a
+# row, and None otherwise.
+#---------------------------------------------------------------------------
+	blackWins = hasFive(black)
+	whiteWins = hasFive(white)
+	if blackWins:
+		return "tie" if whiteWins else "b"
+	return "w" if whiteWins else None
+
+def isGameOver(board):
+#---------------------------------------------------------------------------
+# True if a PentagoBitboard has a winner (or two), or no empty cell.
+#---------------------------------------------------------------------------
+	return board.emptyCells==0 or findWinnerBits(board.black, board.white) is not None
+
+def boardBits(board):
+#---------------------------------------------------------------------------
+# Returns the (black, white) bitboards of a PentagoBoard or PentagoBitboard.
+#---------------------------------------------------------------------------
+	if isinstance(board, PentagoBitboard):
+		return board.black, board.white
+	black = 0
+	white = 0
+	theBoard = board.board
+	for i in range(6):
+		row = theBoard[i]
+		for j in range(6):
+			if row[j]=="b":
+				black |= 1 << CELL_INDEX[i][j]
+			elif row[j]=="w":
+				white |= 1 << CELL_INDEX[i][j]
+	return black, white
+
+#--------------------------------------------------------------------------------
+# Move codes:
+# Inside the engine a move is a small int, (cell*4 + rotBlock-1)*2 + D, where
+# cell is the bit of the placed token and D is 1 for R (clockwise), 0 for L.
+# The "b/n gD" text form is only needed for people and transcripts.
+#--------------------------------------------------------------------------------
+NUM_MOVES = NUM_CELLS * 8
+
+# CELL_BLOCK_POS[cell] is (gameBlock, position), both numbered from 1.
+CELL_BLOCK_POS = [ (cell//9 + 1, cell%9 + 1) for cell in range(NUM_CELLS) ]
+
+def formatMove(code):
+	gameBlock, position = CELL_BLOCK_POS[code >> 3]
+	return str(gameBlock) + "/" + str(position) + " " + \
+	       str((code >> 1 & 3) + 1) + ("R" if code & 1 else "L")
+
+MOVE_STRINGS = [ formatMove(code) for code in range(NUM_MOVES) ]
+
+# The 8 moves (and their text) that place a token in a cell, in getMoves() order.
+CELL_MOVES = [ list(range(8*cell, 8*cell + 8)) for cell in range(NUM_CELLS) ]
+CELL_MOVE_STRINGS = [ [ MOVE_STRINGS[code] for code in CELL_MOVES[cell] ] \
+                      for cell in range(NUM_CELLS) ]
+
+def moveToString(code):
+	return MOVE_STRINGS[code]
+
+def moveFromString(move):
+#---------------------------------------------------------------------------
+# Convert "b/n gD" text to a move code.  D may be upper or lower case.
+#---------------------------------------------------------------------------
+	cell = 9*(int(move[0])-1) + int(move[2])-1
+	return (cell*4 + int(move[4])-1)*2 + (1 if move[5] in "rR" else 0)
+
+# Move lists of PentagoBitboard.getMoveCodes(), by occupied cells.  The lists
+# are shared, so callers must not change them.
+MOVE_CACHE = { }
+MOVE_CACHE_LIMIT = 100000
+
+#--------------------------------------------------------------------------------
+# Zobrist hashing:
+# Each (color, cell) gets a fixed random 64-bit key, and a position hashes to
+# the xor of the keys of its tokens, xor ZOBRIST_SIDE when the second player
+# is to move.  ZOBRIST_BLOCK[color][k][pattern] holds the xor for a whole
+# 9-bit block pattern, so a hash is 8 lookups however many tokens are placed.
+#--------------------------------------------------------------------------------
+zobristRandom = random.Random(20211109)
+ZOBRIST = [ [ zobristRandom.getrandbits(64) for cell in range(NUM_CELLS) ] \
+            for color in range(2) ]
+ZOBRIST_SIDE = zobristRandom.getrandbits(64)
+
+ZOBRIST_BLOCK = [ [ [ 0 ] * 512 for k in range(4) ] for color in range(2) ]
+for _color in range(2):
+	for _k in range(4):
+		_table = ZOBRIST_BLOCK[_color][_k]
+		for _p in range(1, 512):
+			_low = _p & -_p
+			_table[_p] = _table[_p ^ _low] ^ ZOBRIST[_color][9*_k + _low.bit_length()-1]
+
+#--------------------------------------------------------------------------------
+# Board symmetries:
+# Rotating the whole board a quarter turn, or reflecting it, maps subgrids onto
+# subgrids, so it maps positions and moves onto equivalent ones.  Transform t
+# (0..7) sends cell (i,j) to SYMMETRY_MAPS[t](i,j); 0 is the identity and 4..7
+# are the reflections, which turn a Left rotation into a Right one.
+#--------------------------------------------------------------------------------
+SYMMETRY_MAPS = [ lambda i, j: (i, j),     lambda i, j: (j, 5-i),
+                  lambda i, j: (5-i, 5-j), lambda i, j: (5-j, i),
+                  lambda i, j: (i, 5-j),   lambda i, j: (j, i),
+                  lambda i, j: (5-i, j),   lambda i, j: (5-j, 5-i) ]
+NUM_SYMMETRIES = len(SYMMETRY_MAPS)
+
+# SYMMETRY_CELL[t][cell] is the image of cell under transform t.
+SYMMETRY_CELL = [ [ CELL_INDEX[SYMMETRY_MAPS[t](*CELL_ROW_COL[cell])[0]] \
+                              [SYMMETRY_MAPS[t](*CELL_ROW_COL[cell])[1]] \
+                    for cell in range(NUM_CELLS) ] for t in range(NUM_SYMMETRIES) ]
+
+INVERSE_SYMMETRY = [ [ u for u in range(NUM_SYMMETRIES) \
+                       if all(SYMMETRY_CELL[u][SYMMETRY_CELL[t][cell]]==cell \
+                              for cell in range(NUM_CELLS)) ][0] \
+                     for t in range(NUM_SYMMETRIES) ]
+
+# SYMMETRY_BLOCK[t][k][pattern] is the image of a pattern in block k.
+SYMMETRY_BLOCK = [ [ [ 0 ] * 512 for k in range(4) ] for t in range(NUM_SYMMETRIES) ]
+for _t in range(NUM_SYMMETRIES):
+	for _k in range(4):
+		_table = SYMMETRY_BLOCK[_t][_k]
+		for _p in range(1, 512):
+			_low = _p & -_p
+			_table[_p] = _table[_p ^ _low] | \
+			             1 << SYMMETRY_CELL[_t][9*_k + _low.bit_length()-1]
+
+# SYMMETRY_MOVE[t][code] is the image of a move code.
+SYMMETRY_MOVE = [ [ (SYMMETRY_CELL[t][code >> 3]*4 + \
+                     SYMMETRY_CELL[t][9*(code >> 1 & 3)]//9)*2 + \
+                    ((code & 1) ^ (1 if t >= 4 else 0)) \
+                    for code in range(NUM_MOVES) ] for t in range(NUM_SYMMETRIES) ]
+
+def transformBits(bits, t):
+	t0, t1, t2, t3 = SYMMETRY_BLOCK[t]
+	return t0[bits & 0x1FF] | t1[(bits >> 9) & 0x1FF] | \
+	       t2[(bits >> 18) & 0x1FF] | t3[bits >> 27]
+
+def transformMove(code, t):
+	return SYMMETRY_MOVE[t][code]
+
+def canonicalBits(black, white):
+#---------------------------------------------------------------------------
+# Find the canonical form of a position: the smallest (black, white) pair
+# among its 8 images.  Returns (black, white, t, symmetries), where t is the
+# transform that gives the canonical form and symmetries lists the
+# transforms that leave the position unchanged (always including 0).
+#---------------------------------------------------------------------------
+	bestBlack = black
+	bestWhite = white
+	bestT = 0
+	symmetries = [ 0 ]
+	for t in range(1, NUM_SYMMETRIES):
+		tBlack = transformBits(black, t)
+		tWhite = transformBits(white, t)
+		if tBlack==black and tWhite==white:
+			symmetries.append(t)
+		elif tBlack < bestBlack or (tBlack==bestBlack and tWhite < bestWhite):
+			bestBlack = tBlack
+			bestWhite = tWhite
+			bestT = t
+	return bestBlack, bestWhite, bestT, symmetries
+
+def uniqueMoves(moveList, symmetries):
+#---------------------------------------------------------------------------
+# Keep one move of each set of moves that the symmetries of the position
+# map onto each other (the smallest code), in moveList order.
+#---------------------------------------------------------------------------
+	if len(symmetries)==1:
+		return moveList
+	tables = [ SYMMETRY_MOVE[t] for t in symmetries[1:] ]
+	return [ m for m in moveList if all(m <= table[m] for table in tables) ]
+
+def representativeMove(move, symmetries):
+#---------------------------------------------------------------------------
+# The move that uniqueMoves() keeps of those equivalent to move.
+#---------------------------------------------------------------------------
+	return min(SYMMETRY_MOVE[t][move] for t in symmetries)
+
+def zobristHash(black, white):
+	b0, b1, b2, b3 = ZOBRIST_BLOCK[0]
+	w0, w1, w2, w3 = ZOBRIST_BLOCK[1]
+	return b0[black & 0x1FF] ^ b1[(black >> 9) & 0x1FF] ^ \
+	       b2[(black >> 18) & 0x1FF] ^ b3[black >> 27] ^ \
+	       w0[white & 0x1FF] ^ w1[(white >> 9) & 0x1FF] ^ \
+	       w2[(white >> 18) & 0x1FF] ^ w3[white >> 27]
+
+#--------------------------------------------------------------------------------
+# Heuristic tables:
+# Player.nwp28_h() only looks at the player's own pieces, and apart from its
+# last term it adds up scores of each subgrid on its own: its pieces,
+# adjacent pairs and 3-sets.  The last term only needs to know, per subgrid,
+# its count of adjacent pairs and whether it has a piece on an edge or on a
+# corner.  All of these are worked out once, for each subgrid and each of
+# the 512 patterns of one color in it, so that scoring a board is four table
+# lookups plus the last term.
+#
+# The heuristic works on "board2", the four subgrids in the order top-left,
+# bottom-left, top-right, bottom-right, each flattened row by row.  The
+# tables are by game block instead (top-left, top-right, bottom-left,
+# bottom-right), as bitboards are.
+#--------------------------------------------------------------------------------
+
+PIECE_WEIGHTS = np.array([ 5, 20, 5, 20, 10, 20, 5, 20, 5 ])
+EDGE_PIECES = [ 1, 3, 5, 7 ]
+CORNER_PIECES = [ 0, 2, 6, 8 ]
+ADJACENT_PAIRS = [ (1, 3), (1, 5), (3, 7), (5, 7) ]
+THREE_SETS = [ (0, 1, 2), (0, 3, 6), (1, 4, 7), (2, 5, 8), (3, 4, 5), (6, 7, 8) ]
+# the diagonal 3-set through the middle of the board, per board2 block
+CENTER_DIAGONALS = [ (0, 4, 8), (2, 4, 6), (2, 4, 6), (0, 4, 8) ]
+# board2 block of each game block
+GAME_TO_BOARD2 = [ 0, 2, 1, 3 ]
+
+# The cells of each game block, as indexes of a 36-char string (toString())
+SUBGRID_CHARS = np.array([ [ 6*(3*(k//2) + p//3) + 3*(k%2) + p%3 for p in range(9) ] \
+                           for k in range(4) ])
+SUBGRID_SHIFTS = np.array([ 0, 9, 18, 27 ])
+SUBGRID_OFFSETS = np.array([ 0, 512, 1024, 1536 ])
+
+# SUBGRID_FLAGS hold the count of adjacent pairs in the low 3 bits, and these
+EDGE_FLAG = 8
+CORNER_FLAG = 16
+
+def buildSubgridTables():
+#---------------------------------------------------------------------------
+# Returns (scores, flags), arrays indexed by 512*gameBlock + pattern, where
+# pattern is the 9 bits of one color in gameBlock (0..3).
+#---------------------------------------------------------------------------
+	piece = (np.arange(512)[:, None] >> np.arange(9)) & 1
+	adjacents = sum(piece[:, p] & piece[:, q] for p, q in ADJACENT_PAIRS)
+	score = piece @ PIECE_WEIGHTS + 30*adjacents
+	for a, b, c in THREE_SETS:
+		score += 50*(piece[:, a] & piece[:, b] & piece[:, c])
+	scores = np.zeros((4, 512), dtype=np.int16)
+	for k in range(4):
+		a, b, c = CENTER_DIAGONALS[GAME_TO_BOARD2[k]]
+		scores[k] = score + 50*(piece[:, a] & piece[:, b] & piece[:, c])
+	flags = adjacents + EDGE_FLAG*piece[:, EDGE_PIECES].any(axis=1) + \
+	        CORNER_FLAG*piece[:, CORNER_PIECES].any(axis=1)
+	return scores.reshape(2048), np.tile(flags.astype(np.uint8), 4)
+
+SUBGRID_SCORES, SUBGRID_FLAGS = buildSubgridTables()
+
+# The same, for code scoring one board at a time: (score, adjacent pairs,
+# piece on an edge, piece on a corner)
+SUBGRID_TERMS = [ (score, flags & 7, flags & EDGE_FLAG != 0, flags & CORNER_FLAG != 0) \
+                  for score, flags in zip(SUBGRID_SCORES.tolist(), SUBGRID_FLAGS.tolist()) ]
+
+# With DEBUG_EVAL, Search checks every incremental score against nwp28_h()
+DEBUG_EVAL = False
+
+def colorTerms(bits):
+#---------------------------------------------------------------------------
+# The subgrid terms of one color's bitboard, by game block.
+#---------------------------------------------------------------------------
+	return (SUBGRID_TERMS[bits & 0x1FF], SUBGRID_TERMS[512 + ((bits >> 9) & 0x1FF)], \
+	        SUBGRID_TERMS[1024 + ((bits >> 18) & 0x1FF)], SUBGRID_TERMS[1536 + (bits >> 27)])
+
+def combineTerms(terms):
+#---------------------------------------------------------------------------
+# nwp28_h() from the subgrid terms of one color: the four scores, plus the
+# bonus for edge pieces in two diagonally opposite subgrids.
+#---------------------------------------------------------------------------
+	t0, t1, t2, t3 = terms
+	score = t0[0] + t1[0] + t2[0] + t3[0]
+	if t0[1] + t1[1] + t2[1] + t3[1] >= 2:
+		if t0[2] and t3[2]:
+			score += 100 + 1000*t1[3] + 1000*t2[3]
+		if t1[2] and t2[2]:
+			score += 100 + 1000*t0[3] + 1000*t3[3]
+	return score
+
+def heuristicBits(bits):
+	return combineTerms(colorTerms(bits))
+
+def batchHeuristic(boards, token):
+#---------------------------------------------------------------------------
+# Score N boards for token, exactly as Player.nwp28_h().  boards is an
+# N x 36 array of 'b'/'w'/'.' in row-major order (like toString()), or a
+# list of N (black, white) bitboard pairs.  Returns an array of N ints.
+#---------------------------------------------------------------------------
+	if len(boards)==0:
+		return np.zeros(0, dtype=np.int64)
+	if isinstance(boards, np.ndarray):
+		mine = (boards == token)[:, SUBGRID_CHARS]
+		patterns = mine.astype(np.int64) @ (1 << np.arange(9))
+	else:
+		column = 0 if token=="b" else 1
+		bits = np.array([ pair[column] for pair in boards ], dtype=np.int64)
+		patterns = (bits[:, None] >> SUBGRID_SHIFTS) & 0x1FF
+	# patterns is N x 4: the pattern of token in each game block
+	index = patterns + SUBGRID_OFFSETS
+	score = SUBGRID_SCORES[index].sum(axis=1, dtype=np.int64)
+	flags = SUBGRID_FLAGS[index]
+	twoAdjacents = (flags & 7).sum(axis=1) >= 2
+	edges = (flags & EDGE_FLAG) != 0
+	corners = (flags & CORNER_FLAG) != 0
+	for d1, d2, c1, c2 in ((0, 3, 1, 2), (1, 2, 0, 3)):
+		pair = twoAdjacents & edges[:, d1] & edges[:, d2]
+		score += pair * (100 + 1000*corners[:, c1] + 1000*corners[:, c2])
+	return score
+
 #--------------------------------------------------------------------------------
 
 class PentagoBoard:
@@ -223,15 +745,16 @@ class PentagoBoard:
 
 
 	def __str__ (self):
+		theBoard = self.board
 		outstr = "+-------+-------+\n"
 		for offset in range(0,self.BOARD_SIZE,self.GRID_SIZE):
 			for i in range(0+offset,self.GRID_SIZE+offset):
 				outstr += "| "
 				for j in range(0,self.GRID_SIZE):
-					outstr += str(self.board[i][j]) + " "
+					outstr += str(theBoard[i][j]) + " "
 				outstr += "| "
 				for j in range(self.GRID_SIZE,self.BOARD_SIZE):
-					outstr += str(self.board[i][j]) + " "
+					outstr += str(theBoard[i][j]) + " "
 				outstr += "|\n"
 			outstr += "+-------+-------+\n"
 		
@@ -252,22 +775,24 @@ class PentagoBoard:
 			for j in range(self.BOARD_SIZE):
 				if self.board[i][j] == ".":
 				#---------------------------------------------------------------
-				#  For each empty cell on the grid, determine its block (1..4)
-				#  and position (1..9)  (1..GRID_SIZE^2)
-				#---------------------------------------------------------------
-					gameBlock = (i // self.GRID_SIZE)*2 + (j // self.GRID_SIZE) + 1
-					position  = (i%self.GRID_SIZE)*self.GRID_SIZE + (j%self.GRID_SIZE) + 1
-					pos = str(gameBlock) + "/" + str(position) + " "
+				#  For each empty cell on the grid, a token can be placed there
+				#  and any block rotated either left or right.  The move text
+				#  for each cell is precomputed in CELL_MOVE_STRINGS.
 				#---------------------------------------------------------------
-				#  For each block, can place a token in the given cell and
-				#  rotate the block either left or right.
-				#---------------------------------------------------------------
-					numBlocks = (self.BOARD_SIZE // self.GRID_SIZE)**2  # =4 
-					for k in range(numBlocks):  
-						block = str(k+1)
-						moveList.append(pos+block+"L")
-						moveList.append(pos+block+"R")
+					moveList.extend(CELL_MOVE_STRINGS[CELL_INDEX[i][j]])
+
+		return moveList
 
+
+	def getMoveCodes(self):
+	#---------------------------------------------------------------------------
+	# Same moves as getMoves(), as move codes.
+	#---------------------------------------------------------------------------
+		moveList = [ ]
+		for i in range(self.BOARD_SIZE):
+			for j in range(self.BOARD_SIZE):
+				if self.board[i][j] == ".":
+					moveList.extend(CELL_MOVES[CELL_INDEX[i][j]])
 		return moveList
 
 	def rotateLeft(self,gameBlock):
@@ -302,9 +827,18 @@ class PentagoBoard:
 
 	def applyMove(self, move, token, player=None):
 	#---------------------------------------------------------------------------
-	# Perform the given move, and update board.
+	# Perform the given move, and return the new board.  player is no longer
+	# needed, and only kept so that older callers still work.
+	#---------------------------------------------------------------------------
+		return self.playMove(move, token)[0]
+
+
+	def playMove(self, move, token):
+	#---------------------------------------------------------------------------
+	# Perform the given move on a copy of this board.  Returns (new board,
+	# rotated), where rotated is False if the placement already won the game
+	# for token, so no subgrid was rotated.
 	#---------------------------------------------------------------------------
-		global didRotr
 		gameBlock = int(move[0])  # 1,2,3,4
 		position = int(move[2])   # 1,2,3,4,5,6,7,8,9
 		rotBlock = int(move[4])   # 1,2,3,4
@@ -315,22 +849,1451 @@ class PentagoBoard:
 
 		newBoard = copy.deepcopy(self)
 		newBoard.board[i][j] = token
-		checkWin=True
-		if player.token==token:
-			checkWin=player.win(newBoard)
-		else:
-			checkWin=player.loss(newBoard)
-		if( direction=='r' or direction=='R') and not(checkWin):
-			didRotr=True
+		newBoard.emptyCells -= 1
+		if findWinnerBits(*boardBits(newBoard))==token:
+			return newBoard, False
+		if direction=='r' or direction=='R':
 			newBoard = newBoard.rotateRight(rotBlock)
-		elif (direction=='l' or direction=='L') and not(checkWin):
-			didRotr=True
+		elif direction=='l' or direction=='L':
 			newBoard = newBoard.rotateLeft(rotBlock)
-		elif checkWin:
-			didRotr=False
+		return newBoard, True
+
+
+	def rotateInPlace(self,gameBlock,clockwise):
+	#---------------------------------------------------------------------------
+	# Rotate gameBlock of this board, without making a copy.
+	#---------------------------------------------------------------------------
+		rowOffset = ((gameBlock-1)//2)*self.GRID_SIZE
+		colOffset = ((gameBlock-1)%2)*self.GRID_SIZE
+		old = [ self.board[i+rowOffset][colOffset:colOffset+self.GRID_SIZE] \
+		        for i in range(self.GRID_SIZE) ]
+		for i in range(self.GRID_SIZE):
+			for j in range(self.GRID_SIZE):
+				if clockwise:
+					self.board[j+rowOffset][2-i+colOffset] = old[i][j]
+				else:
+					self.board[2-j+rowOffset][i+colOffset] = old[i][j]
+
+
+	def makeMove(self, move, token):
+	#---------------------------------------------------------------------------
+	# Perform the given move (text or move code) on this board, with the same
+	# rules as applyMove().  Returns an undo record for unmakeMove(); its first element is True if
+	# the subgrid was rotated, False if the placement won the game.
+	#---------------------------------------------------------------------------
+		if isinstance(move, str):
+			move = moveFromString(move)
+		i, j = CELL_ROW_COL[move >> 3]
+		rotBlock = (move >> 1 & 3) + 1
+		clockwise = move & 1 == 1
+
+		self.board[i][j] = token
+		self.emptyCells -= 1
+		rotated = findWinnerBits(*boardBits(self)) != token
+		if rotated:
+			self.rotateInPlace(rotBlock, clockwise)
+		return (rotated, (i, j), (rotBlock, clockwise))
+
+
+	def unmakeMove(self, undo):
+	#---------------------------------------------------------------------------
+	# Take back the move that returned the undo record.
+	#---------------------------------------------------------------------------
+		rotated, (i, j), (rotBlock, clockwise) = undo
+		if rotated:
+			self.rotateInPlace(rotBlock, not clockwise)
+		self.board[i][j] = '.'
+		self.emptyCells += 1
+
+
+
+#--------------------------------------------------------------------------------
+
+class PentagoBitboard(PentagoBoard):
+#--------------------------------------------------------------------------------
+# Bitboard mode of PentagoBoard:
+# The position is held as two 36-bit integers, one per color (see the bitboard
+# tables above).  Copying a board copies two integers, and a rotation is one
+# table lookup per color.  The list-of-lists form is still available through
+# the board property, so code written for PentagoBoard keeps working.
+#
+# After enableEvaluation(), the board also keeps the subgrid terms of the
+# heuristic (see "Heuristic tables" above) through its moves, and
+# evaluate() scores it without looking at every cell.
+#--------------------------------------------------------------------------------
+
+	BOARD_SIZE = 6
+	GRID_SIZE = 3
+	GRID_ELEMENTS = 9
+
+	def __init__ (self,board=""):
+	#---------------------------------------------------------------------------
+	# board is a 36-character string as for PentagoBoard, or empty.
+	#---------------------------------------------------------------------------
+		self.black = 0
+		self.white = 0
+		self.emptyCells = NUM_CELLS
+		self.evalTerms = None
+		if board!="":
+			for index in range(NUM_CELLS):
+				if board[index]=="b":
+					self.black |= 1 << SCAN_ORDER[index]
+				elif board[index]=="w":
+					self.white |= 1 << SCAN_ORDER[index]
+			self.emptyCells = board.count(".")
+
+
+	@property
+	def board(self):
+	#---------------------------------------------------------------------------
+	# Build the 6x6 list-of-lists form of the position.
+	#---------------------------------------------------------------------------
+		theBoard = [ [ '.' for col in range(self.BOARD_SIZE) ] \
+		             for row in range(self.BOARD_SIZE) ]
+		for cell in range(NUM_CELLS):
+			i, j = CELL_ROW_COL[cell]
+			if (self.black >> cell) & 1:
+				theBoard[i][j] = 'b'
+			elif (self.white >> cell) & 1:
+				theBoard[i][j] = 'w'
+		return theBoard
+
+
+	def copy(self):
+		newBoard = PentagoBitboard.__new__(PentagoBitboard)
+		newBoard.black = self.black
+		newBoard.white = self.white
+		newBoard.emptyCells = self.emptyCells
+		newBoard.evalTerms = self.evalTerms
 		return newBoard
 
 
+	def enableEvaluation(self):
+	#---------------------------------------------------------------------------
+	# Start keeping the subgrid terms of both colors, in evalTerms.  Boards
+	# copied from this one keep them too.
+	#---------------------------------------------------------------------------
+		self.evalTerms = (colorTerms(self.black), colorTerms(self.white))
+
+
+	def evaluate(self, token):
+	#---------------------------------------------------------------------------
+	# nwp28_h() for token, from the subgrid terms if the board keeps them, or
+	# by table lookups.
+	#---------------------------------------------------------------------------
+		if self.evalTerms is None:
+			return heuristicBits(self.black if token=="b" else self.white)
+		return combineTerms(self.evalTerms[0 if token=="b" else 1])
+
+
+	def toString(self):
+		black = self.black
+		white = self.white
+		return "".join("b" if (black >> cell) & 1 else \
+		               "w" if (white >> cell) & 1 else "." \
+		               for cell in SCAN_ORDER)
+
+
+	def getMoves(self):
+	#---------------------------------------------------------------------------
+	# Same moves, in the same order, as PentagoBoard.getMoves().
+	#---------------------------------------------------------------------------
+		moveList = [ ]
+		occupied = self.black | self.white
+		for cell in SCAN_ORDER:
+			if not (occupied >> cell) & 1:
+				moveList.extend(CELL_MOVE_STRINGS[cell])
+
+		return moveList
+
+
+	def getMoveCodes(self):
+	#---------------------------------------------------------------------------
+	# Same moves as getMoves(), as move codes.  Lists are cached by the set of
+	# occupied cells and shared, so the caller must not change them.
+	#---------------------------------------------------------------------------
+		occupied = self.black | self.white
+		moveList = MOVE_CACHE.get(occupied)
+		if moveList is None:
+			moveList = [ ]
+			for cell in SCAN_ORDER:
+				if not (occupied >> cell) & 1:
+					moveList.extend(CELL_MOVES[cell])
+			if len(MOVE_CACHE) >= MOVE_CACHE_LIMIT:
+				MOVE_CACHE.clear()
+			MOVE_CACHE[occupied] = moveList
+		return moveList
+
+
+	def rotateLeft(self,gameBlock):
+		rotLeft = self.copy()
+		rotLeft.black = rotateBits(self.black, gameBlock, False)
+		rotLeft.white = rotateBits(self.white, gameBlock, False)
+		if rotLeft.evalTerms is not None:
+			rotLeft.enableEvaluation()
+		return rotLeft
+
+
+	def rotateRight(self,gameBlock):
+		rotRight = self.copy()
+		rotRight.black = rotateBits(self.black, gameBlock, True)
+		rotRight.white = rotateBits(self.white, gameBlock, True)
+		if rotRight.evalTerms is not None:
+			rotRight.enableEvaluation()
+		return rotRight
+
+
+	def playMove(self, move, token):
+	#---------------------------------------------------------------------------
+	# Perform the given move on a copy of this board.  Same rules and result
+	# as PentagoBoard.playMove(): no rotation if the placement already wins.
+	#---------------------------------------------------------------------------
+		gameBlock = int(move[0])  # 1,2,3,4
+		position = int(move[2])   # 1,2,3,4,5,6,7,8,9
+		rotBlock = int(move[4])   # 1,2,3,4
+		direction = move[5]       # L,R
+
+		bit = 1 << (9*(gameBlock-1) + position-1)
+		newBoard = self.copy()
+		if token=="b":
+			newBoard.black |= bit
+		else:
+			newBoard.white |= bit
+		newBoard.emptyCells -= 1
+		rotated = findWinnerBits(newBoard.black, newBoard.white)!=token
+		if rotated and direction in "rRlL":
+			clockwise = direction in "rR"
+			newBoard.black = rotateBits(newBoard.black, rotBlock, clockwise)
+			newBoard.white = rotateBits(newBoard.white, rotBlock, clockwise)
+		if newBoard.evalTerms is not None:
+			newBoard.enableEvaluation()
+		return newBoard, rotated
+
+
+	def makeMove(self, move, token):
+	#---------------------------------------------------------------------------
+	# In-place move, as PentagoBoard.makeMove().  The undo record keeps the
+	# two bitboards and the subgrid terms, so unmakeMove() restores them
+	# exactly.
+	#---------------------------------------------------------------------------
+		if isinstance(move, str):
+			move = moveFromString(move)
+		black = self.black
+		white = self.white
+		evalTerms = self.evalTerms
+		bit = 1 << (move >> 3)
+		rotBlock = (move >> 1 & 3) + 1
+		clockwise = move & 1 == 1
+		if token=="b":
+			newBlack = black | bit
+			rotated = not hasFive(newBlack) or hasFive(white)
+			if rotated:
+				self.black = rotateBits(newBlack, rotBlock, clockwise)
+				self.white = rotateBits(white, rotBlock, clockwise)
+			else:
+				self.black = newBlack
+		else:
+			newWhite = white | bit
+			rotated = not hasFive(newWhite) or hasFive(black)
+			if rotated:
+				self.black = rotateBits(black, rotBlock, clockwise)
+				self.white = rotateBits(newWhite, rotBlock, clockwise)
+			else:
+				self.white = newWhite
+		self.emptyCells -= 1
+		if evalTerms is not None:
+			# the mover's subgrid with the new piece, and the rotated subgrid
+			k = move // 72
+			r = rotBlock - 1
+			blackTerms, whiteTerms = evalTerms
+			if token=="b" or rotated and k==r:
+				blackTerms = list(blackTerms)
+				blackTerms[k] = SUBGRID_TERMS[512*k + ((self.black >> 9*k) & 0x1FF)]
+			if token=="w" or rotated and k==r:
+				whiteTerms = list(whiteTerms)
+				whiteTerms[k] = SUBGRID_TERMS[512*k + ((self.white >> 9*k) & 0x1FF)]
+			if rotated and k!=r:
+				blackTerms = list(blackTerms)
+				blackTerms[r] = SUBGRID_TERMS[512*r + ((self.black >> 9*r) & 0x1FF)]
+				whiteTerms = list(whiteTerms)
+				whiteTerms[r] = SUBGRID_TERMS[512*r + ((self.white >> 9*r) & 0x1FF)]
+			self.evalTerms = (blackTerms, whiteTerms)
+		return (rotated, black, white, evalTerms)
+
+
+	def unmakeMove(self, undo):
+		rotated, self.black, self.white, self.evalTerms = undo
+		self.emptyCells += 1
+
+
+	def canonical(self):
+	#---------------------------------------------------------------------------
+	# Returns (canonical board, t, symmetries), as for canonicalBits().  A
+	# move m on the canonical board is transformMove(m, INVERSE_SYMMETRY[t])
+	# on this board.
+	#---------------------------------------------------------------------------
+		black, white, t, symmetries = canonicalBits(self.black, self.white)
+		canonBoard = self.copy()
+		canonBoard.black = black
+		canonBoard.white = white
+		if canonBoard.evalTerms is not None:
+			canonBoard.enableEvaluation()
+		return canonBoard, t, symmetries
+
+
+	def getUniqueMoveCodes(self):
+	#---------------------------------------------------------------------------
+	# getMoveCodes(), leaving out moves that a symmetry of the position makes
+	# equivalent to an earlier one (288 -> 36 moves on the empty board).
+	#---------------------------------------------------------------------------
+		symmetries = canonicalBits(self.black, self.white)[3]
+		return uniqueMoves(self.getMoveCodes(), symmetries)
+
+
+
+#--------------------------------------------------------------------------------
+
+class SearchStopped(Exception):
+#--------------------------------------------------------------------------------
+# Raised inside a search when its time or node limit runs out.
+#--------------------------------------------------------------------------------
+	pass
+
+
+# Bound types of transposition table scores
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+class TranspositionTable:
+#--------------------------------------------------------------------------------
+# Fixed-size table of search results, indexed by Zobrist hash.  Each entry is
+# (key, depth, bound, move, score), where depth is the remaining search depth
+# below the position and bound says whether score is EXACT, a LOWER bound or
+# an UPPER bound.
+#
+# Every index has two slots.  The first keeps the deepest result seen
+# (depth-preferred); the second takes whatever the first one refuses
+# (always-replace), so shallow recent results are not lost either.
+#--------------------------------------------------------------------------------
+
+	def __init__ (self, size=1 << 16):
+		self.size = size
+		self.clear()
+
+
+	def probe(self, key):
+	#---------------------------------------------------------------------------
+	# Returns the entry stored for key, or None.
+	#---------------------------------------------------------------------------
+		self.probes += 1
+		index = key % self.size
+		entry = self.deep[index]
+		if entry is not None and entry[0]==key:
+			self.hits += 1
+			return entry
+		entry = self.recent[index]
+		if entry is not None and entry[0]==key:
+			self.hits += 1
+			return entry
+		return None
+
+
+	def peek(self, key):
+	#---------------------------------------------------------------------------
+	# probe() without counting, for looking at the table outside a search.
+	#---------------------------------------------------------------------------
+		index = key % self.size
+		for entry in (self.deep[index], self.recent[index]):
+			if entry is not None and entry[0]==key:
+				return entry
+		return None
+
+
+	def store(self, key, depth, bound, move, score):
+		self.stores += 1
+		self.place((key, depth, bound, move, score))
+
+
+	def place(self, entry):
+	#---------------------------------------------------------------------------
+	# Put entry in one of its index's slots.
+	#---------------------------------------------------------------------------
+		index = entry[0] % self.size
+		depth = entry[1]
+		old = self.deep[index]
+		if old is None or old[0]==entry[0] or depth >= old[1]:
+			self.deep[index] = entry
+		else:
+			if self.recent[index] is not None:
+				self.overwrites += 1
+			self.recent[index] = entry
+
+
+	def clear(self):
+	#---------------------------------------------------------------------------
+	# Empty the table and reset its counters.
+	#---------------------------------------------------------------------------
+		self.deep = [ None ] * self.size
+		self.recent = [ None ] * self.size
+		self.probes = 0
+		self.hits = 0
+		self.cutoffs = 0
+		self.stores = 0
+		self.overwrites = 0
+
+
+	def flush(self):
+	#---------------------------------------------------------------------------
+	# Save what needs saving; nothing, for a table only in memory.
+	#---------------------------------------------------------------------------
+		pass
+
+
+	def stats(self):
+		return { "size": self.size, "probes": self.probes, "hits": self.hits, \
+		         "cutoffs": self.cutoffs, "stores": self.stores, \
+		         "overwrites": self.overwrites }
+
+
+	def __str__ (self):
+		hitRate = 100.0*self.hits/self.probes if self.probes else 0.0
+		return "TT: " + str(self.probes) + " probes, " + str(self.hits) + \
+		       " hits (%.1f%%), " % hitRate + str(self.cutoffs) + " cutoffs, " + \
+		       str(self.stores) + " stores, " + str(self.overwrites) + " overwrites"
+
+
+
+#--------------------------------------------------------------------------------
+# Transposition table files:
+# A TT_FILE_HEADER (magic, version, entry size, number of slots) followed by
+# fixed-size TT_FILE_ENTRY slots: key, depth, bound, move (TT_FILE_NO_MOVE
+# for none), score, and a CRC-32 of the other fields.  A slot whose checksum
+# does not match, such as an empty one, or one being written by another
+# process, is treated as empty.  Keys are salted with the searching
+# player's token and heuristic (see tableSalt()), since scores are that
+# heuristic's, from that player's point of view; players with different
+# heuristics can share a file without mixing their entries.
+#--------------------------------------------------------------------------------
+TT_FILE_MAGIC = b"PTT1"
+TT_FILE_VERSION = 1
+TT_FILE_HEADER = struct.Struct("<4sHHQ")
+TT_FILE_ENTRY = struct.Struct("<QBBHiI")
+TT_FILE_CHECKED = 16            # bytes of a slot covered by its checksum
+TT_FILE_NO_MOVE = 0xFFFF
+TT_FILE_SALT = { "b": 0, "w": zobristRandom.getrandbits(64) }
+
+def heuristicName(player):
+#---------------------------------------------------------------------------
+# The module file and class that define the player's nwp28_h(), such as
+# "Pentago.Player", the same whether Pentago.py is run or imported.
+#---------------------------------------------------------------------------
+	for cls in type(player).__mro__:
+		if "nwp28_h" in cls.__dict__:
+			fileName = getattr(sys.modules.get(cls.__module__), "__file__", None)
+			module = os.path.splitext(os.path.basename(fileName))[0] if fileName \
+			         else cls.__module__
+			return module + "." + cls.__qualname__
+	return type(player).__qualname__
+
+def tableSalt(token, heuristic):
+	digest = hashlib.blake2b(heuristic.encode("utf-8"), digest_size=8).digest()
+	return TT_FILE_SALT[token] ^ int.from_bytes(digest, "little")
+
+def packTableEntry(key, depth, bound, move, score):
+	data = TT_FILE_ENTRY.pack(key, depth, bound, \
+	                          TT_FILE_NO_MOVE if move is None else move, score, 0)
+	return data[:TT_FILE_CHECKED] + struct.pack("<I", zlib.crc32(data[:TT_FILE_CHECKED]))
+
+class PersistentTable(TranspositionTable):
+#--------------------------------------------------------------------------------
+# A TranspositionTable backed by a file that keeps its entries from one game
+# (and process) to the next.  The search works on the table in memory; a
+# position missing there is looked up in the file, and new entries are
+# written to the file by flush(), under an exclusive lock, keeping the
+# deeper entry of each slot.  Any number of processes can read the file at
+# once.  heuristic names the searching player's heuristic, as given by
+# heuristicName().
+#--------------------------------------------------------------------------------
+
+	def __init__ (self, fileName, token, slots=1 << 18, size=1 << 16, heuristic="Pentago.Player"):
+		TranspositionTable.__init__(self, size)
+		self.fileName = fileName
+		self.salt = tableSalt(token, heuristic)
+		self.dirty = { }
+		if not os.path.exists(fileName):
+			createTableFile(fileName, slots)
+		self.file = open(fileName, "r+b")
+		self.data = mmap.mmap(self.file.fileno(), 0)
+		self.slots = readTableHeader(self.data, fileName)
+
+
+	def clear(self):
+	#---------------------------------------------------------------------------
+	# Empty the table in memory and reset its counters; the file and entries
+	# not yet flushed to it are kept.
+	#---------------------------------------------------------------------------
+		TranspositionTable.clear(self)
+		self.fileHits = 0
+
+
+	def readSlot(self, key):
+	#---------------------------------------------------------------------------
+	# The entry for key in the file, as stored in memory, or None.
+	#---------------------------------------------------------------------------
+		fileKey = key ^ self.salt
+		offset = TT_FILE_HEADER.size + (fileKey % self.slots)*TT_FILE_ENTRY.size
+		slotKey, depth, bound, move, score, check = TT_FILE_ENTRY.unpack_from(self.data, offset)
+		if slotKey!=fileKey or check!=zlib.crc32(self.data[offset:offset+TT_FILE_CHECKED]):
+			return None
+		return (key, depth, bound, None if move==TT_FILE_NO_MOVE else move, score)
+
+
+	def probe(self, key):
+		entry = TranspositionTable.probe(self, key)
+		if entry is None:
+			entry = self.readSlot(key)
+			if entry is not None:
+				self.hits += 1
+				self.fileHits += 1
+				# kept in memory, but not counted as a store
+				self.place(entry)
+		return entry
+
+
+	def peek(self, key):
+		entry = TranspositionTable.peek(self, key)
+		return entry if entry is not None else self.readSlot(key)
+
+
+	def store(self, key, depth, bound, move, score):
+		TranspositionTable.store(self, key, depth, bound, move, score)
+		# keep the deepest entry of each position for the file
+		old = self.dirty.get(key)
+		if old is None or depth >= old[0]:
+			self.dirty[key] = (depth, bound, move, score)
+
+
+	def flush(self):
+		if not self.dirty:
+			return
+		if fcntl is not None:
+			fcntl.flock(self.file.fileno(), fcntl.LOCK_EX)
+		try:
+			for key, (depth, bound, move, score) in self.dirty.items():
+				fileKey = key ^ self.salt
+				offset = TT_FILE_HEADER.size + (fileKey % self.slots)*TT_FILE_ENTRY.size
+				slotKey, oldDepth, oldBound, oldMove, oldScore, check = \
+				    TT_FILE_ENTRY.unpack_from(self.data, offset)
+				# a deeper entry in the slot, for this position or another, stays
+				if depth < oldDepth and \
+				   check==zlib.crc32(self.data[offset:offset+TT_FILE_CHECKED]):
+					continue
+				self.data[offset:offset+TT_FILE_ENTRY.size] = \
+				    packTableEntry(fileKey, depth, bound, move, score)
+			self.data.flush()
+		finally:
+			if fcntl is not None:
+				fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+		self.dirty.clear()
+
+
+	def stats(self):
+		stats = TranspositionTable.stats(self)
+		stats["fileHits"] = self.fileHits
+		return stats
+
+
+	def close(self):
+		self.flush()
+		self.data.close()
+		self.file.close()
+
+def createTableFile(fileName, slots):
+#---------------------------------------------------------------------------
+# Write an empty table file, unless fileName exists.  It is written under
+# another name and linked to fileName, so other processes never see it half
+# written, and a file another process created first is never replaced.
+#---------------------------------------------------------------------------
+	tempName = fileName + "." + str(os.getpid()) + ".tmp"
+	f = open(tempName, "wb")
+	f.write(TT_FILE_HEADER.pack(TT_FILE_MAGIC, TT_FILE_VERSION, TT_FILE_ENTRY.size, slots))
+	f.truncate(TT_FILE_HEADER.size + slots*TT_FILE_ENTRY.size)
+	f.close()
+	try:
+		os.link(tempName, fileName)
+	except FileExistsError:
+		pass
+	finally:
+		os.remove(tempName)
+
+def readTableHeader(data, fileName):
+#---------------------------------------------------------------------------
+# Check the header of a mapped table file; returns its number of slots.
+#---------------------------------------------------------------------------
+	if len(data) < TT_FILE_HEADER.size:
+		raise ValueError(fileName + " is not a transposition table file")
+	magic, version, entrySize, slots = TT_FILE_HEADER.unpack_from(data, 0)
+	if magic!=TT_FILE_MAGIC or version!=TT_FILE_VERSION or \
+	   entrySize!=TT_FILE_ENTRY.size or \
+	   len(data)!=TT_FILE_HEADER.size + slots*TT_FILE_ENTRY.size:
+		raise ValueError(fileName + " is not a transposition table file of version " + \
+		                 str(TT_FILE_VERSION))
+	return slots
+
+
+
+#--------------------------------------------------------------------------------
+
+class SearchStats:
+#--------------------------------------------------------------------------------
+# Counters filled in by a Search, for one computer move.  Counting is always
+# on; the time spent in heuristic evaluation, win detection and move
+# generation is only measured when timing is set, since the clock calls
+# cost more than the counting.
+#--------------------------------------------------------------------------------
+
+	def __init__ (self, timing=False):
+		self.timing = timing
+		self.nodes = 0            # positions visited
+		self.interiorNodes = 0    # positions whose moves were searched
+		self.children = 0         # moves searched from interior positions
+		self.evaluations = 0      # heuristic evaluations (including batched)
+		self.cutNodes = 0         # beta cutoffs ...
+		self.firstMoveCuts = 0    # ... on the first move tried
+		self.ttProbes = 0
+		self.ttHits = 0
+		self.ttCutoffs = 0
+		self.depth = 0            # deepest finished iteration
+		self.iterationNodes = [ ] # nodes of each finished iteration
+		self.evalTime = 0.0
+		self.winTime = 0.0
+		self.moveGenTime = 0.0
+		self.elapsed = 0.0
+
+
+	def firstMoveCutoffRate(self):
+		return self.firstMoveCuts / self.cutNodes if self.cutNodes else 0.0
+
+
+	def averageBranching(self):
+	#---------------------------------------------------------------------------
+	# Moves searched per interior position.
+	#---------------------------------------------------------------------------
+		return self.children / self.interiorNodes if self.interiorNodes else 0.0
+
+
+	def effectiveBranching(self):
+	#---------------------------------------------------------------------------
+	# Growth in nodes from one iteration to the next.
+	#---------------------------------------------------------------------------
+		if len(self.iterationNodes) < 2 or self.iterationNodes[-2]==0:
+			return 0.0
+		return self.iterationNodes[-1] / self.iterationNodes[-2]
+
+
+	def nodesPerSecond(self):
+		return self.nodes / self.elapsed if self.elapsed else 0.0
+
+
+	def asDict(self):
+		return { "depth": self.depth, "nodes": self.nodes, \
+		         "evaluations": self.evaluations, "seconds": round(self.elapsed, 4), \
+		         "nodesPerSecond": round(self.nodesPerSecond()), \
+		         "averageBranching": round(self.averageBranching(), 2), \
+		         "effectiveBranching": round(self.effectiveBranching(), 2), \
+		         "cutNodes": self.cutNodes, \
+		         "firstMoveCutoffRate": round(self.firstMoveCutoffRate(), 3), \
+		         "ttProbes": self.ttProbes, "ttHits": self.ttHits, \
+		         "ttCutoffs": self.ttCutoffs, "evalTime": round(self.evalTime, 4), \
+		         "winTime": round(self.winTime, 4), \
+		         "moveGenTime": round(self.moveGenTime, 4) }
+
+
+	def __str__ (self):
+	#---------------------------------------------------------------------------
+	# One line, used after each computer move and in the transcript.
+	#---------------------------------------------------------------------------
+		outstr = "depth=" + str(self.depth) + " nodes=" + str(self.nodes) + \
+		         " time=%.3fs nps=%d" % (self.elapsed, self.nodesPerSecond()) + \
+		         " bf=%.1f ebf=%.1f" % (self.averageBranching(), self.effectiveBranching()) + \
+		         " cut1=%.2f" % self.firstMoveCutoffRate() + \
+		         " tthits=" + str(self.ttHits) + "/" + str(self.ttProbes)
+		if self.timing:
+			outstr += " eval=%.3fs win=%.3fs movegen=%.3fs" % \
+			          (self.evalTime, self.winTime, self.moveGenTime)
+		return outstr
+
+
+
+#--------------------------------------------------------------------------------
+
+class Search:
+#--------------------------------------------------------------------------------
+# Negamax search with alpha-beta pruning and a transposition table, on a
+# PentagoBitboard.  Scores are the same as Player.negamaxInPlace(): the
+# player's heuristic, from the point of view of the side to move.
+#
+# All the state of a search is kept here, so any number of searches can run
+# at once in one process, each in its own thread.  The only thing they may
+# share is a transposition table; its entries are stored as single tuples
+# and checked against their key, so sharing one is safe, if not exact.
+#--------------------------------------------------------------------------------
+
+	def __init__ (self, player, tt=None, useSymmetry=True, stats=None):
+		self.player = player
+		self.useSymmetry = useSymmetry
+		self.token = player.token
+		self.opponent = "w" if player.token=="b" else "b"
+		self.INFINITY = player.INFINITY
+		self.tt = tt if tt is not None else TranspositionTable()
+		self.stats = stats if stats is not None else SearchStats()
+		self.deadline = None
+		self.nodeLimit = None
+		self.limited = False
+		#---------------------------------------------------------------------
+		# stopEvent, a threading.Event, stops the search from another thread
+		# once set.  onIteration(search, depth, move, score) is called after
+		# each finished iteration of iterativeDeepening().
+		#---------------------------------------------------------------------
+		self.stopEvent = None
+		self.onIteration = None
+		# rootMoves, if set, are the only moves searched at the root
+		self.rootMoves = None
+		#---------------------------------------------------------------------
+		# Move ordering: killer moves per ply, a history score per move code
+		# (cell and rotation), and optionally the heuristic score of each
+		# child.
+		#---------------------------------------------------------------------
+		self.staticOrdering = False
+		#---------------------------------------------------------------------
+		# With batchLeaves, when the first child of a depth 1 node does not
+		# cut off, the other children are scored in one nwp28_hBatch() call.
+		# Only used when the player's heuristic is the one nwp28_hBatch()
+		# reproduces.
+		#---------------------------------------------------------------------
+		self.batchLeaves = type(player).nwp28_h is Player.nwp28_h
+		#---------------------------------------------------------------------
+		# With incrementalEval, search() turns on the board's subgrid terms,
+		# and leaves are scored with board.evaluate() (for the same
+		# heuristic only, as batchLeaves).
+		#---------------------------------------------------------------------
+		self.incrementalEval = self.batchLeaves
+		self.rootDepth = 0
+		self.killers = [ [ None, None ] for ply in range(NUM_CELLS + 1) ]
+		self.history = [ 0 ] * NUM_MOVES
+
+
+	def search(self, board, maxDepth):
+	#---------------------------------------------------------------------------
+	# Search board to maxDepth for the player, or to the end of the game if
+	# that comes first.  Returns (move code, score); the move is None if
+	# there is none to play.
+	#---------------------------------------------------------------------------
+		maxDepth = min(maxDepth, board.emptyCells)
+		self.rootDepth = maxDepth
+		if self.incrementalEval and board.evalTerms is None:
+			board.enableEvaluation()
+		return self.negamax(board, maxDepth, -self.INFINITY, self.INFINITY, 1, True)
+
+
+	def evaluate(self, board):
+	#---------------------------------------------------------------------------
+	# The player's heuristic score of board.
+	#---------------------------------------------------------------------------
+		if board.evalTerms is None:
+			return self.player.nwp28_h(board)
+		score = board.evaluate(self.token)
+		if DEBUG_EVAL:
+			assert score==self.player.nwp28_h(board), \
+			       "incremental score " + str(score) + " for " + board.toString()
+		return score
+
+
+	def iterativeDeepening(self, board, maxDepth, moveTime=None, nodeLimit=None, startDepth=1):
+	#---------------------------------------------------------------------------
+	# Search to depth 1, 2, ... maxDepth, until moveTime (seconds) or
+	# nodeLimit runs out.  An unfinished iteration is thrown away, and the
+	# result of the deepest finished one, (move code, score), is returned;
+	# self.stats.depth is its depth.  Depth 1 always finishes, so there is
+	# always a move.  Each iteration starts with the best moves of the
+	# previous one from the transposition table.
+	#
+	# Starting at a later startDepth skips iterations that are already in
+	# the table; then no iteration is sure to finish, and (None, None) is
+	# returned if none does.
+	#---------------------------------------------------------------------------
+		startTime = time.time()
+		stats = self.stats
+		elapsed = stats.elapsed
+		tt = self.tt
+		ttCounts = (tt.probes, tt.hits, tt.cutoffs)
+		self.deadline = startTime + moveTime if moveTime else None
+		self.nodeLimit = nodeLimit
+		stats.depth = 0
+		result = (None, None)
+		for depth in range(startDepth, min(maxDepth, board.emptyCells) + 1):
+			self.limited = depth > 1
+			nodes = stats.nodes
+			try:
+				# a stopped search leaves its board mid-move, so use a copy
+				result = self.search(board.copy(), depth)
+			except SearchStopped:
+				break
+			stats.depth = depth
+			stats.iterationNodes.append(stats.nodes - nodes)
+			if self.onIteration is not None:
+				stats.elapsed = elapsed + time.time() - startTime
+				self.onIteration(self, depth, result[0], result[1])
+		self.limited = False
+		stats.ttProbes += tt.probes - ttCounts[0]
+		stats.ttHits += tt.hits - ttCounts[1]
+		stats.ttCutoffs += tt.cutoffs - ttCounts[2]
+		stats.elapsed = elapsed + time.time() - startTime
+		return result
+
+
+	def principalVariation(self, board, move, maxLength=NUM_CELLS):
+	#---------------------------------------------------------------------------
+	# The expected line of play from board, starting with the player's move:
+	# the best moves stored in the transposition table, as move codes.
+	#---------------------------------------------------------------------------
+		board = board.copy()
+		pv = [ ]
+		color = 1
+		while move is not None and len(pv) < maxLength:
+			pv.append(move)
+			board.makeMove(move, self.token if color==1 else self.opponent)
+			color = -color
+			if board.emptyCells==0 or findWinnerBits(board.black, board.white) is not None:
+				break
+			if self.useSymmetry:
+				black, white, t, symmetries = canonicalBits(board.black, board.white)
+				key = zobristHash(black, white)
+			else:
+				t = 0
+				key = zobristHash(board.black, board.white)
+			if color==-1:
+				key ^= ZOBRIST_SIDE
+			entry = self.tt.peek(key)
+			if entry is None or entry[3] is None:
+				break
+			move = SYMMETRY_MOVE[INVERSE_SYMMETRY[t]][entry[3]]
+			if move not in board.getMoveCodes():
+				break
+		return pv
+
+
+	def orderMoves(self, board, moveList, hashMove, ply, token, color, symmetries=(0,)):
+	#---------------------------------------------------------------------------
+	# Sort moves, best first: the hash move, placements that win, placements
+	# that block a win of the opponent, killer moves, then by history score
+	# (or by heuristic score, with staticOrdering).  Ties keep moveList order.
+	# moveList holds uniqueMoves() for symmetries, so the hash move, which
+	# may have been stored under a symmetric position, is mapped onto its
+	# equivalent in the list.
+	#---------------------------------------------------------------------------
+		if hashMove is not None and len(symmetries) > 1:
+			hashMove = representativeMove(hashMove, symmetries)
+		black = board.black
+		white = board.white
+		empty = ~(black | white) & FULL_MASK
+		if token=="b":
+			wins = winningCells(black, empty)
+			blocks = winningCells(white, empty)
+		else:
+			wins = winningCells(white, empty)
+			blocks = winningCells(black, empty)
+		killer1, killer2 = self.killers[ply]
+		if self.staticOrdering:
+			scores = { }
+			for m in moveList:
+				undo = board.makeMove(m, token)
+				scores[m] = color*self.evaluate(board)
+				board.unmakeMove(undo)
+		else:
+			scores = self.history
+		def priority(m):
+			cellBit = 1 << (m >> 3)
+			if m==hashMove:
+				return (5, 0)
+			if wins & cellBit:
+				return (4, 0)
+			if blocks & cellBit:
+				return (3, 0)
+			if m==killer1:
+				return (2, 0)
+			if m==killer2:
+				return (1, 0)
+			return (0, scores[m])
+		return sorted(moveList, key=priority, reverse=True)
+
+
+	def evaluateChildren(self, board, moveList, token):
+	#---------------------------------------------------------------------------
+	# Heuristic scores of the boards after each move, in one batch, or one by
+	# one from the subgrid terms if the board keeps them.
+	#---------------------------------------------------------------------------
+		if board.evalTerms is not None:
+			scores = [ ]
+			for m in moveList:
+				undo = board.makeMove(m, token)
+				scores.append(self.evaluate(board))
+				board.unmakeMove(undo)
+			return scores
+		children = [ ]
+		for m in moveList:
+			undo = board.makeMove(m, token)
+			children.append((board.black, board.white))
+			board.unmakeMove(undo)
+		return self.player.nwp28_hBatch(children).tolist()
+
+
+	def checkLimits(self):
+		if self.stopEvent is not None and self.stopEvent.is_set():
+			raise SearchStopped()
+		if self.nodeLimit is not None and self.stats.nodes >= self.nodeLimit:
+			raise SearchStopped()
+		if self.deadline is not None and time.time() >= self.deadline:
+			raise SearchStopped()
+
+
+	def negamax(self, board, depth, a, b, color, root=False):
+	#---------------------------------------------------------------------------
+	# depth is the remaining depth.  Returns (best move code, score).
+	#---------------------------------------------------------------------------
+		stats = self.stats
+		stats.nodes += 1
+		if self.limited and stats.nodes & 63 == 0:
+			self.checkLimits()
+		tt = self.tt
+		#---------------------------------------------------------------------
+		# With useSymmetry, the table is keyed on the canonical form of the
+		# position and holds moves in canonical coordinates; symmetric
+		# positions also skip equivalent sibling moves.
+		#---------------------------------------------------------------------
+		if self.useSymmetry:
+			black, white, t, symmetries = canonicalBits(board.black, board.white)
+			key = zobristHash(black, white)
+		else:
+			t = 0
+			symmetries = [ 0 ]
+			key = zobristHash(board.black, board.white)
+		if color==-1:
+			key ^= ZOBRIST_SIDE
+		hashMove = None
+		entry = tt.probe(key)
+		if entry is not None:
+			if entry[3] is not None:
+				hashMove = SYMMETRY_MOVE[INVERSE_SYMMETRY[t]][entry[3]]
+			if entry[1] >= depth and not root:
+				bound = entry[2]
+				score = entry[4]
+				if bound==EXACT or (bound==LOWER and score>=b) or \
+				   (bound==UPPER and score<=a):
+					tt.cutoffs += 1
+					return hashMove, score
+
+		if stats.timing:
+			startTime = time.perf_counter()
+			winner = findWinnerBits(board.black, board.white)
+			stats.winTime += time.perf_counter() - startTime
+		else:
+			winner = findWinnerBits(board.black, board.white)
+		if depth == 0 or (winner!=None and winner!="tie"):
+			stats.evaluations += 1
+			if stats.timing:
+				startTime = time.perf_counter()
+				score = color*self.evaluate(board)
+				stats.evalTime += time.perf_counter() - startTime
+			else:
+				score = color*self.evaluate(board)
+			tt.store(key, depth, EXACT, None, score)
+			return None, score
+
+		token1 = self.token if color==1 else self.opponent
+		ply = self.rootDepth - depth
+		if stats.timing:
+			startTime = time.perf_counter()
+		moveList = self.orderMoves(board, uniqueMoves(board.getMoveCodes(), symmetries), \
+		                           hashMove, ply, token1, color, symmetries)
+		if stats.timing:
+			stats.moveGenTime += time.perf_counter() - startTime
+		if root and self.rootMoves is not None:
+			moveList = [ m for m in moveList if m in self.rootMoves ]
+		stats.interiorNodes += 1
+		alphaOrig = a
+		theMax = -(self.INFINITY+1)
+		move = None
+		leafScores = None
+		for index in range(len(moveList)):
+			m = moveList[index]
+			stats.children += 1
+			if leafScores is not None:
+				stats.nodes += 1
+				tempVal = color*leafScores[index-1]
+			else:
+				undo = board.makeMove(m,token1)
+				tempVal = -self.negamax(board, depth-1, -b, -a, -color)[1]
+				board.unmakeMove(undo)
+			if tempVal>theMax:
+				theMax = tempVal
+				move = m
+			a = max(a, theMax)
+			if a>=b:
+				stats.cutNodes += 1
+				if index==0:
+					stats.firstMoveCuts += 1
+				killers = self.killers[ply]
+				if m!=killers[0]:
+					killers[1] = killers[0]
+					killers[0] = m
+				self.history[m] += depth*depth
+				break
+			if index==0 and depth==1 and self.batchLeaves and len(moveList) > 1:
+				stats.evaluations += len(moveList) - 1
+				if stats.timing:
+					startTime = time.perf_counter()
+					leafScores = self.evaluateChildren(board, moveList[1:], token1)
+					stats.evalTime += time.perf_counter() - startTime
+				else:
+					leafScores = self.evaluateChildren(board, moveList[1:], token1)
+
+		if theMax<=alphaOrig:
+			bound = UPPER
+		elif theMax>=b:
+			bound = LOWER
+		else:
+			bound = EXACT
+		tt.store(key, depth, bound, SYMMETRY_MOVE[t][move] if move is not None else None, theMax)
+		return move, theMax
+
+
+
+#--------------------------------------------------------------------------------
+
+class EndgameSolver:
+#--------------------------------------------------------------------------------
+# Exact solver for positions with few empty cells.  Only the result counts:
+# 1 (the side to move wins), 0 (draw) or -1 (loss), so there is no heuristic
+# to evaluate, and a search stops at the first winning move.  Results are
+# kept by position; the memo is cleared when it reaches memoLimit entries.
+#--------------------------------------------------------------------------------
+
+	def __init__ (self, memoLimit=1 << 20):
+		self.memo = { }
+		self.memoLimit = memoLimit
+		self.nodes = 0
+
+
+	def solve(self, board, token):
+	#---------------------------------------------------------------------------
+	# Returns (move code, result) for token to move on board (a
+	# PentagoBitboard, left unchanged).
+	#---------------------------------------------------------------------------
+		if len(self.memo) >= self.memoLimit:
+			self.memo.clear()
+		return self.negamax(board.copy(), token)
+
+
+	def negamax(self, board, token):
+		self.nodes += 1
+		key = (board.black, board.white, token)
+		result = self.memo.get(key)
+		if result is not None:
+			return result
+		black = board.black
+		white = board.white
+		empty = ~(black | white) & FULL_MASK
+		#a placement that makes 5 in a row wins without rotating
+		wins = winningCells(black if token=="b" else white, empty)
+		if wins:
+			cell = (wins & -wins).bit_length() - 1
+			result = (CELL_MOVES[cell][0], 1)
+			self.memo[key] = result
+			return result
+
+		opponent = "w" if token=="b" else "b"
+		bestMove = None
+		best = -2
+		for m in board.getMoveCodes():
+			undo = board.makeMove(m, token)
+			winner = findWinnerBits(board.black, board.white)
+			if winner is None:
+				value = 0 if board.emptyCells==0 else -self.negamax(board, opponent)[1]
+			elif winner=="tie":
+				value = 0
+			else:
+				value = 1 if winner==token else -1
+			board.unmakeMove(undo)
+			if value > best:
+				best = value
+				bestMove = m
+				if best==1:
+					break
+		result = (bestMove, best)
+		self.memo[key] = result
+		return result
+
+
+
+#--------------------------------------------------------------------------------
+
+class ThreatSearch:
+#--------------------------------------------------------------------------------
+# Narrow search for short forced wins, run before the full-width search.  The
+# attacker only tries moves that leave it a winning move for its next turn
+# (four of a five in a row, counting lines that a rotation completes), and
+# every reply of the defender is tried; a win is only reported when no reply
+# escapes, so it is certain.  Results are kept by position, as in
+# EndgameSolver.
+#--------------------------------------------------------------------------------
+
+	def __init__ (self, memoLimit=1 << 18):
+		self.memo = { }
+		self.memoLimit = memoLimit
+		self.nodes = 0
+
+
+	def forcedWin(self, board, token, maxMoves):
+	#---------------------------------------------------------------------------
+	# Returns (move code, n) if token to move on board wins in n <= maxMoves
+	# moves of its own whatever the opponent plays, and None otherwise.
+	#---------------------------------------------------------------------------
+		if len(self.memo) >= self.memoLimit:
+			self.memo.clear()
+		return self.attack(board.copy(), token, maxMoves)
+
+
+	def attack(self, board, token, moves):
+		self.nodes += 1
+		key = (board.black, board.white, token, moves)
+		if key in self.memo:
+			return self.memo[key]
+		black = board.black
+		white = board.white
+		empty = ~(black | white) & FULL_MASK
+		if token=="b":
+			move = winningMove(black, white, empty)
+		else:
+			move = winningMove(white, black, empty)
+		result = None
+		if move is not None:
+			result = (move, 1)
+		elif moves > 1 and board.emptyCells >= 3:
+			opponent = "w" if token=="b" else "b"
+			for m in board.getMoveCodes():
+				undo = board.makeMove(m, token)
+				n = None
+				if findWinnerBits(board.black, board.white) is None and \
+				   self.threatens(board, token):
+					n = self.defend(board, opponent, token, moves - 1)
+				board.unmakeMove(undo)
+				if n is not None:
+					result = (m, n + 1)
+					break
+		self.memo[key] = result
+		return result
+
+
+	def threatens(self, board, token):
+	#---------------------------------------------------------------------------
+	# True if token would have a winning move, were it its turn.
+	#---------------------------------------------------------------------------
+		empty = ~(board.black | board.white) & FULL_MASK
+		if token=="b":
+			return winningMove(board.black, board.white, empty) is not None
+		return winningMove(board.white, board.black, empty) is not None
+
+
+	def defend(self, board, token, attacker, moves):
+	#---------------------------------------------------------------------------
+	# token to move against the attacker's threats.  Returns the number of
+	# moves the attacker needs to win after the longest holding reply (0 if
+	# a reply hands it the win), or None if some reply escapes.
+	#---------------------------------------------------------------------------
+		if self.threatens(board, token):
+			return None
+		longest = 0
+		for m in board.getMoveCodes():
+			undo = board.makeMove(m, token)
+			winner = findWinnerBits(board.black, board.white)
+			if winner==attacker:
+				n = 0
+			elif winner is not None or board.emptyCells==0:
+				n = None
+			else:
+				result = self.attack(board, attacker, moves)
+				n = None if result is None else result[1]
+			board.unmakeMove(undo)
+			if n is None:
+				return None
+			longest = max(longest, n)
+		return longest
+
+
+	def safeMoves(self, board, token):
+	#---------------------------------------------------------------------------
+	# If the opponent threatens to win, the moves of token that stop every
+	# threat (or end the game without losing it); otherwise None.
+	#---------------------------------------------------------------------------
+		opponent = "w" if token=="b" else "b"
+		if not self.threatens(board, opponent):
+			return None
+		board = board.copy()
+		safe = [ ]
+		for m in board.getMoveCodes():
+			undo = board.makeMove(m, token)
+			winner = findWinnerBits(board.black, board.white)
+			if winner is None:
+				if board.emptyCells==0 or not self.threatens(board, opponent):
+					safe.append(m)
+			elif winner!=opponent:
+				safe.append(m)
+			board.unmakeMove(undo)
+		return safe
+
+
+
+#--------------------------------------------------------------------------------
+# Opening book:
+# A file of positions and the move to play in them, written by book.py.  A
+# 12-byte header (BOOK_HEADER: magic, version, the search depth the moves
+# came from, number of entries) is followed by BOOK_ENTRY records sorted by
+# key: the Zobrist hash of the canonical position, with ZOBRIST_SIDE added
+# when White is to move; the move in canonical coordinates; its score.
+#--------------------------------------------------------------------------------
+BOOK_MAGIC = b"PBK1"
+BOOK_VERSION = 1
+BOOK_HEADER = struct.Struct("<4sHHI")
+BOOK_ENTRY = struct.Struct("<QHi")
+
+def bookKey(black, white, token):
+#---------------------------------------------------------------------------
+# Returns (book key, t), t being the transform to the canonical position.
+#---------------------------------------------------------------------------
+	black, white, t, symmetries = canonicalBits(black, white)
+	key = zobristHash(black, white)
+	if token=="w":
+		key ^= ZOBRIST_SIDE
+	return key, t
+
+class OpeningBook:
+#--------------------------------------------------------------------------------
+# Read-only access to a book file.  The file is only opened, and mapped into
+# memory, on the first lookup; a lookup is a binary search of the records.
+#--------------------------------------------------------------------------------
+
+	def __init__ (self, fileName):
+		self.fileName = fileName
+		self.data = None
+		self.depth = 0
+		self.count = 0
+
+
+	def load(self):
+		f = open(self.fileName, "rb")
+		try:
+			data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+		finally:
+			f.close()
+		if len(data) < BOOK_HEADER.size:
+			raise ValueError(self.fileName + " is not an opening book")
+		magic, version, depth, count = BOOK_HEADER.unpack_from(data, 0)
+		if magic!=BOOK_MAGIC or version!=BOOK_VERSION or \
+		   len(data)!=BOOK_HEADER.size + count*BOOK_ENTRY.size:
+			raise ValueError(self.fileName + " is not an opening book of version " + \
+			                 str(BOOK_VERSION))
+		self.depth = depth
+		self.count = count
+		self.data = data
+
+
+	def lookup(self, black, white, token):
+	#---------------------------------------------------------------------------
+	# The book move for token in the given position, as (move code, score),
+	# or None.
+	#---------------------------------------------------------------------------
+		if self.data is None:
+			self.load()
+		key, t = bookKey(black, white, token)
+		lo = 0
+		hi = self.count
+		while lo < hi:
+			mid = (lo + hi) // 2
+			entryKey, move, score = BOOK_ENTRY.unpack_from(self.data, \
+			                            BOOK_HEADER.size + mid*BOOK_ENTRY.size)
+			if entryKey < key:
+				lo = mid + 1
+			elif entryKey > key:
+				hi = mid
+			else:
+				return SYMMETRY_MOVE[INVERSE_SYMMETRY[t]][move], score
+		return None
+
+
+	def __len__ (self):
+		if self.data is None:
+			self.load()
+		return self.count
+
+# Open books by file name, shared by the players that use them
+OPENING_BOOKS = { }
+
+def getOpeningBook(fileName):
+	if fileName not in OPENING_BOOKS:
+		OPENING_BOOKS[fileName] = OpeningBook(fileName)
+	return OPENING_BOOKS[fileName]
+
+
+
+#--------------------------------------------------------------------------------
+# Root-parallel search:
+# The root moves are split across a pool of worker processes.  Each worker
+# searches the positions after its root moves, using the best root score any
+# worker has found so far (kept in shared memory) as its alpha bound.  The
+# bound is lowered by one, so every move that could be best gets an exact
+# score, and the first best move in getMoves() order is picked: the same
+# move and score as the serial testNegamax() at the same depth.
+#
+# Pools are started on first use and kept for later moves.  Several threads
+# may search with the same pool at once: each running parallelSearch() takes
+# one of the PARALLEL_SLOTS alpha values, and waits if none is free.
+#--------------------------------------------------------------------------------
+PARALLEL_SLOTS = 16
+SEARCH_POOLS = { }
+searchPoolsLock = threading.Lock()
+searchIds = itertools.count(1)
+
+# In worker processes: the shared root alphas, and the searches of the
+# current parallel searches (with their transposition tables), by search id
+workerAlpha = None
+workerSearch = { }
+
+def initSearchWorker(alpha):
+	global workerAlpha
+	workerAlpha = alpha
+
+def getSearchPool(workers):
+#---------------------------------------------------------------------------
+# Returns (pool, shared alphas, queue of free alpha slots) for the given
+# number of workers.
+#---------------------------------------------------------------------------
+	with searchPoolsLock:
+		if workers not in SEARCH_POOLS:
+			alpha = multiprocessing.Array("i", PARALLEL_SLOTS)
+			pool = concurrent.futures.ProcessPoolExecutor(workers, \
+			          initializer=initSearchWorker, initargs=(alpha,))
+			freeSlots = queue.Queue()
+			for slot in range(PARALLEL_SLOTS):
+				freeSlots.put(slot)
+			SEARCH_POOLS[workers] = (pool, alpha, freeSlots)
+		return SEARCH_POOLS[workers]
+
+def shutdownSearchPools():
+	with searchPoolsLock:
+		for pool, alpha, freeSlots in SEARCH_POOLS.values():
+			pool.shutdown()
+		SEARCH_POOLS.clear()
+
+def searchRootMoves(searchId, slot, playerClass, token, boardString, moves, depth, deadline, \
+                    ttSize=1 << 16):
+#---------------------------------------------------------------------------
+# Worker task: score each (index, root move) in moves to the given depth,
+# sharing alpha slot with the other workers.  The worker's transposition
+# table has ttSize indexes.  Returns a list of (index, score), and the
+# number of nodes searched.
+#---------------------------------------------------------------------------
+	if searchId not in workerSearch:
+		if len(workerSearch) >= PARALLEL_SLOTS:
+			del workerSearch[min(workerSearch)]
+		workerSearch[searchId] = Search(playerClass("worker", "computer", token), \
+		                                TranspositionTable(ttSize), useSymmetry=True)
+	search = workerSearch[searchId]
+	search.rootDepth = depth
+	search.deadline = deadline
+	search.limited = deadline is not None
+	board = PentagoBitboard(boardString)
+	if search.incrementalEval:
+		board.enableEvaluation()
+	nodes = search.stats.nodes
+	results = [ ]
+	for index, m in moves:
+		a = workerAlpha[slot]
+		undo = board.makeMove(m, token)
+		score = -search.negamax(board, depth-1, -search.INFINITY, -(a-1), -1)[1]
+		board.unmakeMove(undo)
+		results.append((index, score))
+		with workerAlpha.get_lock():
+			if score > workerAlpha[slot]:
+				workerAlpha[slot] = score
+	return results, search.stats.nodes - nodes
+
+def parallelSearch(player, board, depth, workers, deadline=None, searchId=None, stats=None, \
+                   rootMoves=None):
+#---------------------------------------------------------------------------
+# Search board to depth with a pool of worker processes.  Returns
+# (move code, score).  Raises SearchStopped if the time.time() deadline
+# passes first.  Calls with the same searchId share the workers'
+# transposition tables.  Nodes searched are added to stats, if given.
+# rootMoves, if given, are the only moves searched, as in Search.
+#---------------------------------------------------------------------------
+	pool, alpha, freeSlots = getSearchPool(workers)
+	if searchId is None:
+		searchId = next(searchIds)
+	slot = freeSlots.get()
+	with alpha.get_lock():
+		alpha[slot] = -player.INFINITY
+	moveList = board.getMoveCodes()
+	if rootMoves is not None:
+		moveList = [ m for m in moveList if m in rootMoves ]
+	indexed = list(enumerate(moveList))
+	# small tasks, in move order, so the workers stay balanced
+	taskSize = max(1, len(indexed) // (workers*8))
+	futures = [ pool.submit(searchRootMoves, searchId, slot, type(player), player.token, \
+	                        board.toString(), indexed[start:start+taskSize], depth, deadline, \
+	                        player.ttSize) \
+	            for start in range(0, len(indexed), taskSize) ]
+	results = [ ]
+	try:
+		for future in futures:
+			taskResults, nodes = future.result()
+			results.extend(taskResults)
+			if stats is not None:
+				stats.nodes += nodes
+	finally:
+		for future in futures:
+			future.cancel()
+		# the slot may only be reused once no task can still write to it
+		concurrent.futures.wait(futures)
+		freeSlots.put(slot)
+	index, score = max(results, key=lambda result: (result[1], -result[0]))
+	return moveList[index], score
+
+def parallelIterativeDeepening(player, board, maxDepth, workers, moveTime=None, rootMoves=None):
+#---------------------------------------------------------------------------
+# Search.iterativeDeepening() with parallelSearch() for each iteration.
+# Returns (move code, score, SearchStats); only node counts, depth and time
+# are filled in.
+#---------------------------------------------------------------------------
+	startTime = time.time()
+	deadline = startTime + moveTime if moveTime else None
+	searchId = next(searchIds)
+	stats = SearchStats()
+	result = (None, None)
+	for depth in range(1, min(maxDepth, board.emptyCells) + 1):
+		nodes = stats.nodes
+		try:
+			result = parallelSearch(player, board, depth, workers, \
+			                        deadline if depth > 1 else None, searchId, stats, rootMoves)
+		except SearchStopped:
+			break
+		stats.depth = depth
+		stats.iterationNodes.append(stats.nodes - nodes)
+	stats.elapsed = time.time() - startTime
+	return result[0], result[1], stats
+
+
 
 #--------------------------------------------------------------------------------
 
@@ -342,6 +2305,40 @@ class Player:
 
 	def __init__ (self,name,playerType,token):
 		self.INFINITY = 10000
+		self.searchDepth = 2
+		self.moveTime = None
+		self.nodeLimit = None
+		self.workers = 1
+		self.showStats = False
+		self.timing = False
+		self.ttSize = 1 << 16
+		self.ttFile = None
+		self.tt = None
+		self.lastSearch = None
+		self.lastStats = None
+		#---------------------------------------------------------------------
+		# Pondering: after each move, the position after the expected reply
+		# is searched in a background thread until the next move is asked
+		# for.  ponderResult is (board string, (move code, score), depth).
+		#---------------------------------------------------------------------
+		self.ponder = False
+		self.ponderThread = None
+		self.ponderSearch = None
+		self.ponderResult = None
+		self.ponderHits = 0
+		self.book = None
+		self.bookHits = 0
+		self.endgameThreshold = 4
+		self.endgameSolver = None
+		#---------------------------------------------------------------------
+		# Threat search: forced wins of up to threatMoves moves are played
+		# without a full search.  blockMoves are the moves that stop the
+		# opponent's threats, if it has any; the full search only looks at
+		# those.
+		#---------------------------------------------------------------------
+		self.threatMoves = 2
+		self.threatSearch = None
+		self.blockMoves = None
 
 		self.name = name
 		
@@ -363,6 +2360,63 @@ class Player:
 		       ", plays " + descr[self.token] + " tokens"
 
 
+	def configure(self, settings):
+	#---------------------------------------------------------------------------
+	# Apply search settings given as strings, from the command line or the
+	# config file:
+	#   movetime  time limit per move, in milliseconds
+	#   nodes     node limit per move
+	#   depth     search depth (default 2, or unlimited if a time or node
+	#             limit is given)
+	#   workers   number of processes for the search (node limits are not
+	#             used when this is more than 1)
+	#   stats     1 to print search statistics after each move and add them
+	#             to the transcript; "timing" also measures where time goes
+	#   ponder    1 to search during the opponent's turn
+	#   book      opening book file (see book.py) to play from before searching
+	#   ttfile    file to keep the transposition table in between games (see
+	#             ttfile.py); created if missing
+	#   ttsize    number of indexes of the transposition table in memory
+	#             (default 65536; each holds two entries)
+	#   endgame   solve positions with at most this many empty cells exactly
+	#             (default 4; 0 turns the solver off)
+	#   threats   look for forced wins of up to this many moves before
+	#             searching (default 2; 0 turns the threat search off, and
+	#             3 or more can take seconds)
+	#---------------------------------------------------------------------------
+		if "movetime" in settings:
+			self.moveTime = int(settings["movetime"]) / 1000.0
+		if "nodes" in settings:
+			self.nodeLimit = int(settings["nodes"])
+		if "depth" in settings:
+			self.searchDepth = int(settings["depth"])
+		elif "movetime" in settings or "nodes" in settings:
+			self.searchDepth = NUM_CELLS
+		if "workers" in settings:
+			self.workers = int(settings["workers"])
+		if "stats" in settings:
+			self.showStats = settings["stats"] not in ("", "0")
+			self.timing = settings["stats"]=="timing"
+		if "ponder" in settings:
+			self.ponder = settings["ponder"] not in ("", "0")
+		if "book" in settings:
+			self.book = getOpeningBook(settings["book"]) if settings["book"] else None
+		if "ttfile" in settings:
+			self.ttFile = settings["ttfile"] or None
+			self.tt = None
+		if "ttsize" in settings:
+			self.ttSize = int(settings["ttsize"])
+			if self.ttSize < 1:
+				raise ValueError("ttsize must be at least 1")
+			if self.tt is not None and self.tt.size!=self.ttSize:
+				self.tt.flush()
+				self.tt = None
+		if "endgame" in settings:
+			self.endgameThreshold = int(settings["endgame"])
+		if "threats" in settings:
+			self.threatMoves = int(settings["threats"])
+
+
 	def gethumanMove(self, board):
 	#---------------------------------------------------------------------------
 	# If the opponent is a human, the user is prompted to input a legal move.
@@ -396,58 +2450,11 @@ class Player:
 	def findWinner(self,board):
 	#---------------------------------------------------------------------------
 	# Determines if player has won, by finding '5 in a row'.
-	# Student code needed here.
+	# Returns self.token or the opponent's token for a single winner, "tie" if
+	# both players have 5 in a row, and None otherwise.
 	#---------------------------------------------------------------------------
-		theBoard=board.board
-		opponentToken=''
-		playerWin=0
-		opponentWin=0
-		if self.token=='w':
-			opponentToken='b'
-		else:
-			opponentToken='w'
-
-		#C is faster than python, therefore I'm only running numpy operations
-		newBoard=np.array(theBoard)
-		diag1=newBoard.diagonal(0)
-		diag2=newBoard.diagonal(1)
-		diag3=newBoard.diagonal(-1)
-		diag4=np.fliplr(newBoard).diagonal(0)
-		diag5=np.fliplr(newBoard).diagonal(1)
-		diag6=np.fliplr(newBoard).diagonal(-1)
-		for i in range(len(newBoard)):
-			if (newBoard[i][0:5] == self.token).sum() == 5 or (newBoard[i][1:6] == self.token).sum() == 5:
-				playerWin+=1
-			elif (newBoard[i][0:5] == opponentToken).sum() == 5 or (newBoard[i][1:6] == opponentToken).sum() == 5:
-				opponentWin+=1
-			if (newBoard[:,i][0:5] == self.token).sum() == 5 or (newBoard[:,i][1:6] == self.token).sum() == 5:
-				playerWin+=1
-			elif (newBoard[:,i][0:5] == opponentToken).sum() == 5 or (newBoard[:,i][1:6] == opponentToken).sum() == 5:
-				opponentWin+=1
-		
-		if (diag1[0:5] == self.token).sum() == 5 or (diag1[1:6] == self.token).sum() == 5:
-			playerWin+=1
-		elif (diag1[0:5] == opponentToken).sum() == 5 or (diag1[1:6] == opponentToken).sum() == 5:
-			opponentWin+=1
-		if (diag4[0:5] == self.token).sum() == 5 or (diag4[1:6] == self.token).sum() == 5:
-			playerWin+=1
-		elif (diag4[0:5] == opponentToken).sum() == 5 or (diag4[1:6] == opponentToken).sum() == 5:
-			opponentWin+=1
-		checker=[diag2,diag3,diag5,diag6]
-		for i in checker:
-			if (i==self.token).sum() == 5:
-				playerWin+=1
-			elif (i== opponentToken).sum() == 5:
-				opponentWin+=1
-
-		if playerWin>0 and opponentWin==0:
-			return self.token
-		elif playerWin==0 and opponentWin>0:
-			return opponentToken
-		elif playerWin>0 and opponentWin>0:
-			return "tie"
-		else:
-			return None
+		black, white = boardBits(board)
+		return findWinnerBits(black, white)
 
 	def win(self,board):
 		result=self.findWinner(board)
@@ -553,6 +2560,10 @@ class Player:
 						score+=1000
 		checkSetAdjacents()
 		return score
+
+	def nwp28_hBatch(self,boards):
+		#Same scores as nwp28_h, for a whole list of boards in one call (see batchHeuristic)
+		return batchHeuristic(boards,self.token)
 #------------------------------------------------------------------------------------------------------------------------
 #THE BELOW COMMENT IS MY PREVIOUS CODE COMMENTED OUT, YES I KNOW IT'S A STRING WITH NO PARENT, IT DOES NOTHING
 #I LEFT IT HERE FOR READING CONVENIENCE OF THE COMMENTS PREVIOUSLY PLACED HERE
@@ -663,6 +2674,32 @@ class Player:
 				break
 		return move, theMax
 
+	def negamaxInPlace(self, board, opponent, depth, maxDepth, a, b, move, color):
+	#---------------------------------------------------------------------------
+	# Same search as testNegamax(), but moves are made and taken back on a
+	# single board with makeMove()/unmakeMove() instead of copying it, and
+	# moves are move codes (see moveToString()).
+	#---------------------------------------------------------------------------
+		if color==1:
+			token1=self.token
+		else:
+			token1=opponent
+		winner=self.findWinner(board)
+		if depth == maxDepth or (winner!=None and winner!="tie"):
+			return move, color*self.nwp28_h(board)
+		theMax=-(self.INFINITY+1)
+		for m in board.getMoveCodes():
+			undo=board.makeMove(m,token1)
+			tempVal=-(self.negamaxInPlace(board, opponent, depth + 1, maxDepth, -b, -a, m, -color)[1])
+			board.unmakeMove(undo)
+			if tempVal>theMax:
+				theMax=tempVal
+				move=m
+			a = max(a, theMax)
+			if a>=b:
+				break
+		return move, theMax
+
 	def getHumanMove(self, board):
 	#---------------------------------------------------------------------------
 	# If the opponent is a human, the user is prompted to input a legal move.
@@ -695,13 +2732,198 @@ class Player:
 	# If the opponent is a computer, use artificial intelligence to select
 	# the best move.
 	# For this demo, a move is chosen at random from the list of legal moves.
+	# Returns None if the game on board is already over.
+	#---------------------------------------------------------------------------
+		#search a bitboard copy: copies and rotations are much cheaper there
+		searchBoard = PentagoBitboard(board.toString())
+		pondered = self.stopPondering()
+		if isGameOver(searchBoard):
+			self.lastStats = None
+			return None
+		move = self.quickMove(searchBoard)
+		if move is not None:
+			self.finishMove(searchBoard, move)
+			return moveToString(move)
+		if self.workers > 1:
+			move, value, self.lastStats = parallelIterativeDeepening(self, searchBoard, \
+			                                  self.searchDepth, self.workers, self.moveTime, \
+			                                  self.blockMoves)
+			return moveToString(move) if move is not None else None
+		self.openTable()
+		self.lastStats = SearchStats(self.timing)
+		self.lastSearch = Search(self, self.tt, stats=self.lastStats)
+		#-----------------------------------------------------------------------
+		# If the opponent played the expected reply, carry on from the depth
+		# pondering reached, or use its move if that was deep enough.
+		#-----------------------------------------------------------------------
+		self.lastSearch.rootMoves = self.blockMoves
+		maxDepth = min(self.searchDepth, searchBoard.emptyCells)
+		if pondered is not None and pondered[0]==searchBoard.toString() and pondered[2] > 0 \
+		   and (self.blockMoves is None or pondered[1][0] in self.blockMoves):
+			self.ponderHits += 1
+			move, value = pondered[1]
+			self.lastStats.depth = pondered[2]
+			if pondered[2] < maxDepth:
+				result = self.lastSearch.iterativeDeepening(searchBoard, self.searchDepth, \
+				             self.moveTime, self.nodeLimit, pondered[2] + 1)
+				if result[0] is not None:
+					move, value = result
+				else:
+					# no deeper iteration finished: the pondered depth stands
+					self.lastStats.depth = pondered[2]
+		else:
+			move, value = self.lastSearch.iterativeDeepening(searchBoard, \
+			                  self.searchDepth, self.moveTime, self.nodeLimit)
+		if move is None:
+			return None
+		self.finishMove(searchBoard, move)
+		return moveToString(move)
+
+
+	def openTable(self):
+	#---------------------------------------------------------------------------
+	# Make the transposition table on first use; it is kept from one move to
+	# the next.
 	#---------------------------------------------------------------------------
-		opponent = "w" if self.token=="b" else "b"
-		#negamax(board, opponent, depth, maxDepth, alpha, Beta, move, player)
-		move, value = self.testNegamax(board, opponent,0, 2, -self.INFINITY, self.INFINITY, None ,1)
+		if self.tt is None:
+			if self.ttFile is not None:
+				self.tt = PersistentTable(self.ttFile, self.token, size=self.ttSize, \
+				                          heuristic=heuristicName(self))
+			else:
+				self.tt = TranspositionTable(self.ttSize)
+
+
+	def finishMove(self, board, move):
+	#---------------------------------------------------------------------------
+	# After choosing move (a move code) on board, however it was found: save
+	# the transposition table, and start pondering.
+	#---------------------------------------------------------------------------
+		if self.tt is not None:
+			self.tt.flush()
+		if self.ponder:
+			self.startPondering(board, move)
+
+
+	def quickMove(self, board):
+	#---------------------------------------------------------------------------
+	# The move code from the opening book, the endgame solver or the threat
+	# search, if one of them applies to board (a PentagoBitboard); otherwise
+	# None.
+	#---------------------------------------------------------------------------
+		self.blockMoves = None
+		if self.book is not None:
+			entry = self.book.lookup(board.black, board.white, self.token)
+			if entry is not None and entry[0] in board.getMoveCodes():
+				self.bookHits += 1
+				self.lastStats = None
+				return entry[0]
+		if board.emptyCells <= self.endgameThreshold:
+			return self.solveEndgame(board)
+		if self.threatMoves > 0:
+			return self.findThreats(board)
+		return None
+
+
+	def solveEndgame(self, board):
+	#---------------------------------------------------------------------------
+	# The move of the exact endgame solver; its node count, time and the
+	# number of empty cells (as depth) go in lastStats.
+	#---------------------------------------------------------------------------
+		if self.endgameSolver is None:
+			self.endgameSolver = EndgameSolver()
+		startTime = time.time()
+		nodes = self.endgameSolver.nodes
+		move, result = self.endgameSolver.solve(board, self.token)
+		self.lastStats = SearchStats()
+		self.lastStats.nodes = self.endgameSolver.nodes - nodes
+		self.lastStats.depth = board.emptyCells
+		self.lastStats.elapsed = time.time() - startTime
+		return move
+
+
+	def findThreats(self, board):
+	#---------------------------------------------------------------------------
+	# The first move of a forced win, or the only move that stops the
+	# opponent's threats; otherwise None, with blockMoves set if several
+	# moves stop them.  The threat search's node count, time and the plies
+	# of the win (as depth) go in lastStats.
+	#---------------------------------------------------------------------------
+		if self.threatSearch is None:
+			self.threatSearch = ThreatSearch()
+		startTime = time.time()
+		nodes = self.threatSearch.nodes
+		move = None
+		found = self.threatSearch.forcedWin(board, self.token, self.threatMoves)
+		if found is not None:
+			move, depth = found[0], 2*found[1] - 1
+		else:
+			self.blockMoves = self.threatSearch.safeMoves(board, self.token)
+			if not self.blockMoves:
+				# no threats, or no way to stop them all
+				self.blockMoves = None
+			elif len(self.blockMoves)==1:
+				move, depth = self.blockMoves[0], 1
+				self.blockMoves = None
+		if move is not None:
+			self.lastStats = SearchStats()
+			self.lastStats.nodes = self.threatSearch.nodes - nodes
+			self.lastStats.depth = depth
+			self.lastStats.elapsed = time.time() - startTime
 		return move
 
 
+	def startPondering(self, board, move):
+	#---------------------------------------------------------------------------
+	# Play move and the reply the last search expects on a copy of board, and
+	# search the position after them in a background thread, with the same
+	# time and node limits as a move.
+	#---------------------------------------------------------------------------
+		self.openTable()
+		pv = Search(self, self.tt).principalVariation(board, move, 2)
+		if len(pv) < 2:
+			return
+		ponderBoard = board.copy()
+		ponderBoard.makeMove(pv[0], self.token)
+		ponderBoard.makeMove(pv[1], "w" if self.token=="b" else "b")
+		if ponderBoard.emptyCells==0 or \
+		   findWinnerBits(ponderBoard.black, ponderBoard.white) is not None:
+			return
+		search = Search(self, self.tt)
+		search.stopEvent = threading.Event()
+		self.ponderSearch = search
+		self.ponderResult = None
+		def ponder():
+			result = search.iterativeDeepening(ponderBoard, self.searchDepth, \
+			                                   self.moveTime, self.nodeLimit)
+			self.ponderResult = (ponderBoard.toString(), result, search.stats.depth)
+		self.ponderThread = threading.Thread(target=ponder, daemon=True)
+		self.ponderThread.start()
+
+
+	def stopPondering(self):
+	#---------------------------------------------------------------------------
+	# Stop the pondering search, if any.  Returns its ponderResult, or None.
+	#---------------------------------------------------------------------------
+		if self.ponderThread is None:
+			return None
+		self.ponderSearch.stopEvent.set()
+		self.ponderThread.join()
+		self.ponderThread = None
+		self.ponderSearch = None
+		return self.ponderResult
+
+
+	def close(self):
+	#---------------------------------------------------------------------------
+	# Call when the player's game is over, or the player is dropped: stops
+	# pondering, and saves the transposition table if it is kept in a file.
+	# The player can still be used afterwards.
+	#---------------------------------------------------------------------------
+		self.stopPondering()
+		if self.tt is not None:
+			self.tt.flush()
+
+
 	def playerMove(self, board):
 	#---------------------------------------------------------------------------
 	# Depending on the player type, return either a human move or computer move.
@@ -713,9 +2935,10 @@ class Player:
 
 
 
-def explainMove(move, player):
+def explainMove(move, player, rotated=True):
 #---------------------------------------------------------------------------
-# Explain actions performed by move
+# Explain actions performed by move.  rotated is False if the placement won
+# the game, so no subgrid was rotated (see playMove()).
 #---------------------------------------------------------------------------
 
 	gameBlock = int(move[0])  # 1,2,3,4
@@ -726,7 +2949,7 @@ def explainMove(move, player):
 	G = PentagoBoard().GRID_SIZE
 	i = (position-1)//G + G*((gameBlock-1)//2) ;
 	j = ((position-1)%G) + G*((gameBlock-1)%2) ;
-	if didRotr==True:
+	if rotated:
 		print("Placing " + player.token + " in cell [" + str(i) + "][" + str(j) +  \
 		  	"], and rotating Block " + str(rotBlock) +  \
 		  	(" Left" if direction=="L" else " Right"))
@@ -761,80 +2984,110 @@ if __name__ == "__main__":
 #  A transcript of the game is produced with name beginning "transcript_" and
 #  ending with a timestamp value.  The file contains player info, followed by
 #  lines containing each state as a 36-character string, followed by the move made.
+#  With --record file, the game is appended to that game record file instead.
 #--------------------------------------------------------------------------------
 
 	timestamp = time.time()
 	print( "\n-------------------\nWelcome to Pentago!\n-------------------" )
 	
-	pb, player = gameSetup(timestamp)
+	pb, player, settings = gameSetup(timestamp)
 	print("\n" + str(player[0]) + "\n" + str(player[1]) + "\n")
 
 	#-----------------------------------------------------------------------
 	# Play game, alternating turns until a win encountered, board is full
 	# with no winner, or human user types "exit".
 	#-----------------------------------------------------------------------
-	f = open("transcript_"+ str(timestamp) + ".txt","w")
-	f.write("\n" + str(player[0]) + "\n" + str(player[1]) + "\n")
-	gameOver = False
-	currentPlayer = 0
-	print(pb)
-	numEmpty = pb.emptyCells
-	startTime=time.time()
-	while( not gameOver ):
-		move = player[currentPlayer].playerMove(pb)
-		if move == "exit":
-			break
-		if didRotr==True:	
-			print(player[currentPlayer].name + "'s move: " + move)
-		else:
-			theMove=str(move)
-			size=len(theMove)
-			newMove=theMove[:size - 6]
-			print(player[currentPlayer].name + "'s move: " + newMove)
-		f.write(pb.toString() + "\t" + move + "\n")
-		
-		newBoard = copy.deepcopy(pb)
-		newBoard = newBoard.applyMove(move,player[currentPlayer].token,player[currentPlayer])
+	record = None
+	f = None
+	if settings.get("record"):
+		#records imports this module, so it is only imported when needed
+		import records
+		record = records.GameRecordWriter(settings["record"])
+		record.startGame([ (p.name, p.playerType, p.token) for p in player ], timestamp, \
+		                 any(p.showStats for p in player))
+	else:
+		f = open("transcript_"+ str(timestamp) + ".txt","w")
+		f.write("\n" + str(player[0]) + "\n" + str(player[1]) + "\n")
+	try:
+		gameOver = False
+		currentPlayer = 0
+		print(pb)
+		numEmpty = pb.emptyCells
+		startTime=time.time()
+		while( not gameOver ):
+			move = player[currentPlayer].playerMove(pb)
+			if move == "exit":
+				break
+			newBoard, rotated = pb.playMove(move,player[currentPlayer].token)
+			if rotated:
+				print(player[currentPlayer].name + "'s move: " + move)
+			else:
+				print(player[currentPlayer].name + "'s move: " + move[:3])
+			stats = player[currentPlayer].lastStats
+			showStats = player[currentPlayer].playerType=="computer" and \
+			            player[currentPlayer].showStats and stats is not None
+			if showStats:
+				print("Search: " + str(stats))
+			if record is not None:
+				black, white = boardBits(pb)
+				record.addPly(black, white, move, \
+				              (stats.depth, stats.nodes, stats.elapsed) if showStats else None)
+			elif showStats:
+				f.write(pb.toString() + "\t" + move + "\t" + str(stats) + "\n")
+			else:
+				f.write(pb.toString() + "\t" + move + "\n")
 		
-		explainMove(move,player[currentPlayer]) 
-
-		print(newBoard)
-		numEmpty = numEmpty - 1
-		win0=False
-		win1=False
-		tie=False
-
-		if player[0].findWinner(newBoard)==player[0].token:
-			win0=True
-		elif player[0].findWinner(newBoard)=="tie":
-			win0=True
-		else:
+			explainMove(move,player[currentPlayer],rotated) 
+
+			print(newBoard)
+			numEmpty = numEmpty - 1
 			win0=False
-		if player[1].findWinner(newBoard)==player[1].token:
-			win1=True
-		elif player[1].findWinner(newBoard)=="tie":
-			win1=True
-		else:
 			win1=False
-		gameOver = win0 or win1 or numEmpty==0
+			tie=False
 
-		currentPlayer = 1 - currentPlayer
-		pb = copy.deepcopy(newBoard)
-	print("Runtime: %s seconds "%(time.time()-startTime))
-	#-----------------------------------------------------------------------
-	# Game is over, determine winner.
-	#-----------------------------------------------------------------------
-	if not gameOver:  # Human player requested "exit"
-		print("Exiting game.")
-	elif (win0 and win1):
-		print("Game ends in a tie (multiple winners).")
-	elif win0:
-		print(player[0].name + " (" + descr[ player[0].token ] + ") wins")
-	elif win1:
-		print(player[1].name + " (" + descr[ player[1].token ] + ") wins")
-	elif numEmpty==0:
-		print("Game ends in a tie (no winner).")
-
-	f.write(pb.toString() + "\t\n")
-	f.close()
+			if player[0].findWinner(newBoard)==player[0].token:
+				win0=True
+			elif player[0].findWinner(newBoard)=="tie":
+				win0=True
+			else:
+				win0=False
+			if player[1].findWinner(newBoard)==player[1].token:
+				win1=True
+			elif player[1].findWinner(newBoard)=="tie":
+				win1=True
+			else:
+				win1=False
+			gameOver = win0 or win1 or numEmpty==0
 
+			currentPlayer = 1 - currentPlayer
+			pb = newBoard
+		print("Runtime: %s seconds "%(time.time()-startTime))
+		#-----------------------------------------------------------------------
+		# Game is over, determine winner.
+		#-----------------------------------------------------------------------
+		if not gameOver:  # Human player requested "exit"
+			print("Exiting game.")
+		elif (win0 and win1):
+			print("Game ends in a tie (multiple winners).")
+		elif win0:
+			print(player[0].name + " (" + descr[ player[0].token ] + ") wins")
+		elif win1:
+			print(player[1].name + " (" + descr[ player[1].token ] + ") wins")
+		elif numEmpty==0:
+			print("Game ends in a tie (no winner).")
+
+		if record is not None:
+			black, white = boardBits(pb)
+			result = None
+			if gameOver:
+				result = findWinnerBits(black, white) or "tie"
+			record.endGame(black, white, result)
+		else:
+			f.write(pb.toString() + "\t\n")
+	finally:
+		for p in player:
+			p.close()
+		if record is not None:
+			record.close()
+		if f is not None:
+			f.close()
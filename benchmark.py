@@ -0,0 +1,214 @@
+#!/usr/bin/python
+
+#---------------------------------------------------------------------------
+# Pentago benchmarks
+# Timings of the Pentago engine, printed as JSON so that runs can be saved
+# and compared over time.
+#
+#   python3 benchmark.py [-o results.json] [-p perftDepth] [-d depth]
+#                        [--perft] [--movegen] [--eval] [--search] [--parallel]
+#
+#   --perft     perft node counts from the fixed positions below, with
+#               PentagoBoard and PentagoBitboard (the counts must agree)
+#   --movegen   getMoves + applyMove nodes per second, and getMoveCodes +
+#               makeMove/unmakeMove nodes per second
+#   --eval      findWinner and nwp28_h calls per second
+#   --search    time to reach each depth with testNegamax and with Search
+#   --parallel  root-parallel search time with 1, 2, 4 and 8 workers
+#
+# With no benchmark named, all but --parallel are run.
+#---------------------------------------------------------------------------
+
+import sys, getopt
+import time
+import json
+import Pentago
+
+# Fixed positions: name, 36-character board, token to move
+POSITIONS = [
+	("empty", "", "b"),
+	("example", "w.b.bw.w.b.wb.w..wb....w...bw.bbb.ww", "b"),
+	("midgame", "..b..w.w..b...b...w...b..w....w...b.", "b"),
+	("endgame", "wbbbb.bw.wwbbwww.wwwwb.wbw.b.bbbbwbw", "b"),
+]
+
+# The midgame position, used for single-position benchmarks
+DEFAULT_BOARD = POSITIONS[2][1]
+
+
+def otherToken(token):
+	return "w" if token=="b" else "b"
+
+
+def perft(board, token, depth):
+#---------------------------------------------------------------------------
+# Count the move sequences of length depth from board.  A game that ends
+# earlier (5 in a row, or a full board) counts once and is not extended.
+# Works with PentagoBoard and PentagoBitboard through makeMove/unmakeMove.
+#---------------------------------------------------------------------------
+	if depth==0:
+		return 1
+	nodes = 0
+	for move in board.getMoveCodes():
+		undo = board.makeMove(move, token)
+		if board.emptyCells==0 or \
+		   Pentago.findWinnerBits(*Pentago.boardBits(board)) is not None:
+			nodes += 1
+		else:
+			nodes += perft(board, otherToken(token), depth-1)
+		board.unmakeMove(undo)
+	return nodes
+
+
+def perftSuite(depth):
+	results = [ ]
+	for name, boardString, token in POSITIONS:
+		for boardClass in (Pentago.PentagoBoard, Pentago.PentagoBitboard):
+			board = boardClass(boardString)
+			startTime = time.time()
+			nodes = perft(board, token, depth)
+			seconds = time.time() - startTime
+			results.append({ "position": name, "board": boardClass.__name__, \
+			                 "depth": depth, "nodes": nodes, "seconds": round(seconds, 4), \
+			                 "nodesPerSecond": round(nodes / seconds) if seconds else 0 })
+	counts = { }
+	for result in results:
+		counts.setdefault(result["position"], set()).add(result["nodes"])
+	mismatches = [ name for name in counts if len(counts[name]) > 1 ]
+	return { "benchmark": "perft", "results": results, "mismatches": mismatches }
+
+
+def timeCalls(function, minSeconds=0.5):
+#---------------------------------------------------------------------------
+# Call function repeatedly for at least minSeconds; returns calls per second.
+#---------------------------------------------------------------------------
+	calls = 0
+	startTime = time.time()
+	while True:
+		for i in range(20):
+			function()
+		calls += 20
+		seconds = time.time() - startTime
+		if seconds >= minSeconds:
+			return calls / seconds
+
+
+def moveGenSuite():
+	player = Pentago.Player("bench", "computer", "b")
+	results = [ ]
+	for name, boardString, token in POSITIONS:
+		for boardClass in (Pentago.PentagoBoard, Pentago.PentagoBitboard):
+			board = boardClass(boardString)
+			moveCount = len(board.getMoves())
+			def applyAll():
+				for move in board.getMoves():
+					board.applyMove(move, token, player)
+			def makeAll():
+				for move in board.getMoveCodes():
+					board.unmakeMove(board.makeMove(move, token))
+			results.append({ "position": name, "board": boardClass.__name__, \
+			    "applyMoveNodesPerSecond": round(timeCalls(applyAll)*moveCount), \
+			    "makeMoveNodesPerSecond": round(timeCalls(makeAll)*moveCount) })
+	return { "benchmark": "movegen", "results": results }
+
+
+def evalSuite():
+	player = Pentago.Player("bench", "computer", "b")
+	results = [ ]
+	for name, boardString, token in POSITIONS:
+		for boardClass in (Pentago.PentagoBoard, Pentago.PentagoBitboard):
+			board = boardClass(boardString)
+			results.append({ "position": name, "board": boardClass.__name__, \
+			    "findWinnerPerSecond": round(timeCalls(lambda: player.findWinner(board))), \
+			    "nwp28_hPerSecond": round(timeCalls(lambda: player.nwp28_h(board))) })
+	return { "benchmark": "eval", "results": results }
+
+
+def searchSuite(boardString, maxDepth):
+#---------------------------------------------------------------------------
+# Time to complete each depth, for testNegamax (on a PentagoBoard, as it
+# was first written) and for Search with iterative deepening.
+#---------------------------------------------------------------------------
+	player = Pentago.Player("bench", "computer", "b")
+	results = [ ]
+	for depth in range(1, maxDepth+1):
+		startTime = time.time()
+		move, score = player.testNegamax(Pentago.PentagoBoard(boardString), "w", 0, depth, \
+		                  -player.INFINITY, player.INFINITY, None, 1)
+		results.append({ "search": "testNegamax", "depth": depth, "move": move, \
+		                 "score": int(score), "seconds": round(time.time() - startTime, 4) })
+	for depth in range(1, maxDepth+1):
+		search = Pentago.Search(player)
+		startTime = time.time()
+		move, score = search.iterativeDeepening(Pentago.PentagoBitboard(boardString), depth)
+		results.append({ "search": "Search", "depth": depth, \
+		                 "move": Pentago.moveToString(move), "score": int(score), \
+		                 "nodes": search.stats.nodes, "seconds": round(time.time() - startTime, 4) })
+	return { "benchmark": "search", "board": boardString, "results": results }
+
+
+def parallelScaling(boardString, depth, workerCounts=(1, 2, 4, 8)):
+#---------------------------------------------------------------------------
+# Time parallelSearch() on one position for each worker count.  Each pool
+# is started (and warmed up with a depth 1 search) before timing.
+#---------------------------------------------------------------------------
+	player = Pentago.Player("bench", "computer", "b")
+	board = Pentago.PentagoBitboard(boardString)
+	runs = [ ]
+	for workers in workerCounts:
+		Pentago.parallelSearch(player, board, 1, workers)
+		startTime = time.time()
+		move, score = Pentago.parallelSearch(player, board, depth, workers)
+		seconds = time.time() - startTime
+		runs.append({ "workers": workers, "seconds": round(seconds, 4), \
+		              "move": Pentago.moveToString(move), "score": int(score) })
+	Pentago.shutdownSearchPools()
+	for run in runs:
+		run["speedup"] = round(runs[0]["seconds"] / run["seconds"], 2) if run["seconds"] else 0.0
+	return { "benchmark": "parallelScaling", "board": boardString, \
+	         "depth": depth, "runs": runs }
+
+
+if __name__ == "__main__":
+	boardString = DEFAULT_BOARD
+	depth = 2
+	perftDepth = 2
+	output = None
+	selected = [ ]
+	opts, args = getopt.getopt(sys.argv[1:], "b:d:p:o:", \
+	               ["board=", "depth=", "perft-depth=", "output=", \
+	                "perft", "movegen", "eval", "search", "parallel"])
+	for opt, arg in opts:
+		if opt in ("-b", "--board"):
+			boardString = arg
+		elif opt in ("-d", "--depth"):
+			depth = int(arg)
+		elif opt in ("-p", "--perft-depth"):
+			perftDepth = int(arg)
+		elif opt in ("-o", "--output"):
+			output = arg
+		else:
+			selected.append(opt[2:])
+	if not selected:
+		selected = [ "perft", "movegen", "eval", "search" ]
+
+	results = { "time": time.time(), "python": sys.version.split()[0], "benchmarks": [ ] }
+	for name in selected:
+		if name=="perft":
+			results["benchmarks"].append(perftSuite(perftDepth))
+		elif name=="movegen":
+			results["benchmarks"].append(moveGenSuite())
+		elif name=="eval":
+			results["benchmarks"].append(evalSuite())
+		elif name=="search":
+			results["benchmarks"].append(searchSuite(boardString, depth))
+		elif name=="parallel":
+			results["benchmarks"].append(parallelScaling(boardString, depth))
+
+	text = json.dumps(results, indent=2)
+	if output is None:
+		print(text)
+	else:
+		f = open(output, "w")
+		f.write(text + "\n")
+		f.close()
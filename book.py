@@ -0,0 +1,119 @@
+#!/usr/bin/python
+
+#---------------------------------------------------------------------------
+# Pentago opening book builder
+# Searches every position of the first few plies, from the empty board with
+# either color to move first, and writes the best moves to a book file that
+# Pentago.py players can use (--book file, or book=file in the config).
+# Positions are stored once per symmetry class, so the book stays small.
+#
+#   python3 book.py [-o book.bin] [-p plies] [-d depth] [-t movetime]
+#
+# Options:
+#   -o, --output    book file (default book.bin)
+#   -p, --plies     positions up to this many moves into the game (default 2)
+#   -d, --depth     search depth for each position (default 3)
+#   -t, --movetime  milliseconds per position; with a time limit the search
+#                   goes as deep as it can, up to --depth
+#   -i, --info      print the header and size of an existing book
+#---------------------------------------------------------------------------
+
+import sys, getopt
+import time
+import Pentago
+
+
+def bookPositions(plies):
+#---------------------------------------------------------------------------
+# The canonical positions up to plies moves in, as (black, white, token to
+# move), for games started by either color.  Finished games are left out.
+#---------------------------------------------------------------------------
+	level = { (0, 0, "b"), (0, 0, "w") }
+	positions = [ ]
+	for ply in range(plies + 1):
+		positions.extend(sorted(level))
+		if ply==plies:
+			break
+		nextLevel = set()
+		for black, white, token in level:
+			board = Pentago.PentagoBitboard()
+			board.black = black
+			board.white = white
+			board.emptyCells = Pentago.NUM_CELLS - bin(black | white).count("1")
+			for m in board.getUniqueMoveCodes():
+				undo = board.makeMove(m, token)
+				if Pentago.findWinnerBits(board.black, board.white) is None and board.emptyCells > 0:
+					canonBlack, canonWhite, t, symmetries = \
+					    Pentago.canonicalBits(board.black, board.white)
+					nextLevel.add((canonBlack, canonWhite, "w" if token=="b" else "b"))
+				board.unmakeMove(undo)
+		level = nextLevel
+	return positions
+
+
+def buildBook(plies, depth, moveTime=None, progress=None):
+#---------------------------------------------------------------------------
+# Search the book positions.  Returns a dictionary of book key ->
+# (canonical move code, score).
+#---------------------------------------------------------------------------
+	player = { token: Pentago.Player("book", "computer", token) for token in ("b", "w") }
+	tt = { token: Pentago.TranspositionTable(1 << 18) for token in ("b", "w") }
+	entries = { }
+	positions = bookPositions(plies)
+	for n, (black, white, token) in enumerate(positions):
+		board = Pentago.PentagoBitboard()
+		board.black = black
+		board.white = white
+		board.emptyCells = Pentago.NUM_CELLS - bin(black | white).count("1")
+		search = Pentago.Search(player[token], tt[token])
+		move, score = search.iterativeDeepening(board, depth, moveTime)
+		key, t = Pentago.bookKey(black, white, token)
+		entries[key] = (move, int(score))
+		if progress is not None:
+			progress(n + 1, len(positions))
+	return entries
+
+
+def writeBook(fileName, entries, depth):
+	f = open(fileName, "wb")
+	f.write(Pentago.BOOK_HEADER.pack(Pentago.BOOK_MAGIC, Pentago.BOOK_VERSION, \
+	                                 depth, len(entries)))
+	for key in sorted(entries):
+		move, score = entries[key]
+		f.write(Pentago.BOOK_ENTRY.pack(key, move, score))
+	f.close()
+
+
+if __name__ == "__main__":
+	output = "book.bin"
+	plies = 2
+	depth = 3
+	moveTime = None
+	info = None
+	opts, args = getopt.getopt(sys.argv[1:], "o:p:d:t:i:", \
+	               ["output=", "plies=", "depth=", "movetime=", "info="])
+	for opt, arg in opts:
+		if opt in ("-o", "--output"):
+			output = arg
+		elif opt in ("-p", "--plies"):
+			plies = int(arg)
+		elif opt in ("-d", "--depth"):
+			depth = int(arg)
+		elif opt in ("-t", "--movetime"):
+			moveTime = int(arg) / 1000.0
+		elif opt in ("-i", "--info"):
+			info = arg
+
+	if info is not None:
+		book = Pentago.OpeningBook(info)
+		print(info + ": " + str(len(book)) + " positions, searched to depth " + str(book.depth))
+		sys.exit(0)
+
+	def progress(done, total):
+		if done==total or done % 25==0:
+			print("%d/%d positions, %.1f seconds" % (done, total, time.time() - startTime))
+
+	startTime = time.time()
+	entries = buildBook(plies, depth, moveTime, progress)
+	writeBook(output, entries, depth)
+	print(output + ": " + str(len(entries)) + " positions")
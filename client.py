@@ -0,0 +1,174 @@
+#!/usr/bin/python
+
+#---------------------------------------------------------------------------
+# Pentago client
+# Talks to server.py.  With no -n, plays one game at the terminal against
+# the server's computer player.  With -n, plays that many games at once,
+# picking random moves for the human side, and prints the results: a quick
+# way to check a local server.
+#
+#   python3 client.py [-H host] [-p port] [-u socket] [-n games]
+#                     [-b board] [-t movetime] [-d depth] [-s seed]
+#---------------------------------------------------------------------------
+
+import sys, getopt
+import json
+import random
+import asyncio
+import Pentago
+from server import DEFAULT_PORT, MAX_LINE
+
+
+class PentagoClient:
+#--------------------------------------------------------------------------------
+# One connection to the server.  Requests can be sent from many coroutines
+# at once; replies are matched to them by id.
+#--------------------------------------------------------------------------------
+
+	def __init__ (self):
+		self.reader = None
+		self.writer = None
+		self.nextId = 1
+		self.waiting = { }
+		self.readTask = None
+
+
+	async def connect(self, host="127.0.0.1", port=DEFAULT_PORT, unixPath=None):
+		if unixPath is not None:
+			self.reader, self.writer = await asyncio.open_unix_connection(unixPath, limit=MAX_LINE)
+		else:
+			self.reader, self.writer = await asyncio.open_connection(host, port, limit=MAX_LINE)
+		self.readTask = asyncio.get_running_loop().create_task(self.readReplies())
+
+
+	async def readReplies(self):
+		while True:
+			line = await self.reader.readline()
+			if not line:
+				break
+			reply = json.loads(line)
+			future = self.waiting.pop(reply.get("id"), None)
+			if future is not None and not future.done():
+				future.set_result(reply)
+		for future in self.waiting.values():
+			if not future.done():
+				future.set_exception(ConnectionError("server closed the connection"))
+		self.waiting.clear()
+
+
+	async def request(self, cmd, **fields):
+	#---------------------------------------------------------------------------
+	# Send one request and wait for its reply.
+	#---------------------------------------------------------------------------
+		fields["cmd"] = cmd
+		fields["id"] = self.nextId
+		self.nextId += 1
+		future = asyncio.get_running_loop().create_future()
+		self.waiting[fields["id"]] = future
+		self.writer.write((json.dumps(fields) + "\n").encode())
+		await self.writer.drain()
+		return await future
+
+
+	async def close(self):
+		self.writer.close()
+		await self.writer.wait_closed()
+		if self.readTask is not None:
+			await self.readTask
+
+
+
+def showMoves(reply):
+	for played in reply["moves"]:
+		print(played["player"] + "'s move: " + \
+		      (played["move"] if played["rotated"] else played["move"][:3]))
+
+
+async def playInteractive(client, boardString, settings):
+#---------------------------------------------------------------------------
+# One game at the terminal; the user plays Black and moves first.
+#---------------------------------------------------------------------------
+	loop = asyncio.get_running_loop()
+	reply = await client.request("new", board=boardString, settings=settings, \
+	            players=[ [ "You", "human", "b" ], [ "Computer", "computer", "w" ] ])
+	game = reply["game"]
+	while reply["winner"] is None:
+		print(Pentago.PentagoBitboard(reply["board"]))
+		move = await loop.run_in_executor(None, input, \
+		           "Input your move (block/position block-to-rotate direction): ")
+		if move=="exit":
+			break
+		newReply = await client.request("move", game=game, move=move)
+		if not newReply["ok"]:
+			print(newReply["error"])
+			continue
+		reply = newReply
+		showMoves(reply)
+	print(Pentago.PentagoBitboard(reply["board"]))
+	if reply["winner"] is not None:
+		print("Winner: " + reply["winner"])
+	await client.request("close", game=game)
+
+
+async def playRandom(client, boardString, settings, rng):
+#---------------------------------------------------------------------------
+# One game of random moves (Black) against the computer (White).  Returns
+# the final reply.
+#---------------------------------------------------------------------------
+	reply = await client.request("new", board=boardString, settings=settings, \
+	            players=[ [ "Random", "human", "b" ], [ "Computer", "computer", "w" ] ])
+	game = reply["game"]
+	while reply["ok"] and reply["winner"] is None:
+		moveList = Pentago.PentagoBitboard(reply["board"]).getMoves()
+		reply = await client.request("move", game=game, move=rng.choice(moveList))
+	await client.request("close", game=game)
+	return reply
+
+
+async def main(host, port, unixPath, games, boardString, settings, seed):
+	client = PentagoClient()
+	await client.connect(host, port, unixPath)
+	try:
+		if games is None:
+			await playInteractive(client, boardString, settings)
+		else:
+			rng = random.Random(seed)
+			results = await asyncio.gather(*[ playRandom(client, boardString, settings, \
+			                                      random.Random(rng.random())) \
+			                                  for n in range(games) ])
+			for reply in results:
+				print(json.dumps({ "game": reply.get("game"), "ok": reply["ok"], \
+				                   "winner": reply.get("winner"), "error": reply.get("error"), \
+				                   "moveCount": reply.get("moveCount") }))
+	finally:
+		await client.close()
+
+
+if __name__ == "__main__":
+	host = "127.0.0.1"
+	port = DEFAULT_PORT
+	unixPath = None
+	games = None
+	boardString = ""
+	settings = { }
+	seed = 0
+	opts, args = getopt.getopt(sys.argv[1:], "H:p:u:n:b:t:d:s:", \
+	               ["host=", "port=", "unix=", "games=", "board=", "movetime=", "depth=", "seed="])
+	for opt, arg in opts:
+		if opt in ("-H", "--host"):
+			host = arg
+		elif opt in ("-p", "--port"):
+			port = int(arg)
+		elif opt in ("-u", "--unix"):
+			unixPath = arg
+		elif opt in ("-n", "--games"):
+			games = int(arg)
+		elif opt in ("-b", "--board"):
+			boardString = arg
+		elif opt in ("-t", "--movetime"):
+			settings["movetime"] = arg
+		elif opt in ("-d", "--depth"):
+			settings["depth"] = arg
+		elif opt in ("-s", "--seed"):
+			seed = int(arg)
+	asyncio.run(main(host, port, unixPath, games, boardString, settings, seed))
@@ -0,0 +1,201 @@
+#!/usr/bin/python
+
+#---------------------------------------------------------------------------
+# Pentago engine protocol
+# A long-lived engine process driven by text commands on stdin, in the
+# style of UCI, so that a match runner can keep one process per game and
+# the transposition tables stay warm from move to move.
+#
+#   python3 engine.py
+#
+# Commands:
+#   uci                      replies "id name ..." and "uciok"
+#   isready                  replies "readyok"
+#   newgame                  forget the transposition tables
+#   setoption name ttsize value N
+#                            entries per transposition table
+#   position startpos|<36-character board> [b|w] [moves <move> ...]
+#                            set the position; b or w is the token to move
+#                            (by default the one with fewer tokens on the
+#                            board, Black if equal), and the moves
+#                            ("2/3 1L" ...) are played from it
+#   go [depth N] [movetime ms] [nodes N] [infinite]
+#                            search in the background; without limits,
+#                            depth is the Player default
+#   stop                     end the search; its best move is still sent
+#                            (position, go, newgame, setoption and board also
+#                            stop a search that is still running)
+#   board                    print the current position
+#   quit
+#
+# While searching, the engine prints one line per finished depth:
+#   info depth 3 score 310 nodes 37508 time 523 nps 71741 pv 4/4 1L 2/5 3R ...
+# and at the end:
+#   bestmove 4/4 1L
+#---------------------------------------------------------------------------
+
+import sys
+import threading
+import Pentago
+
+
+class Engine:
+#--------------------------------------------------------------------------------
+# The engine state: position, side to move, one transposition table per
+# side, and the search running in the background, if any.
+#--------------------------------------------------------------------------------
+
+	def __init__ (self, out=sys.stdout):
+		self.out = out
+		self.outLock = threading.Lock()
+		self.ttSize = 1 << 16
+		self.tt = { }
+		self.board = Pentago.PentagoBitboard()
+		self.token = "b"
+		self.searchThread = None
+		self.stopEvent = threading.Event()
+
+
+	def send(self, line):
+		with self.outLock:
+			self.out.write(line + "\n")
+			self.out.flush()
+
+
+	def setPosition(self, words):
+	#---------------------------------------------------------------------------
+	# words: startpos or a board, an optional token, then "moves" and the
+	# moves, each as two words.  Raises ValueError for a bad position.
+	#---------------------------------------------------------------------------
+		if not words:
+			raise ValueError("position needs a board")
+		boardString = "" if words[0]=="startpos" else words[0]
+		if boardString and (len(boardString)!=Pentago.NUM_CELLS or \
+		                    any(c not in "bw." for c in boardString)):
+			raise ValueError("board must be 36 characters of b, w and .")
+		board = Pentago.PentagoBitboard(boardString)
+		rest = words[1:]
+		if rest and rest[0] in ("b", "w"):
+			token = rest[0]
+			rest = rest[1:]
+		else:
+			token = "w" if bin(board.black).count("1") > bin(board.white).count("1") else "b"
+		if rest:
+			if rest[0]!="moves" or len(rest)%2==0:
+				raise ValueError("expected: moves <block/position rotation> ...")
+			for i in range(1, len(rest), 2):
+				move = rest[i] + " " + rest[i+1]
+				if move not in board.getMoves():
+					raise ValueError("illegal move: " + move)
+				board.makeMove(move, token)
+				token = "w" if token=="b" else "b"
+		self.board = board
+		self.token = token
+
+
+	def go(self, words):
+	#---------------------------------------------------------------------------
+	# Start searching the current position in a background thread.
+	#---------------------------------------------------------------------------
+		limits = { }
+		for i in range(0, len(words)-1):
+			if words[i] in ("depth", "movetime", "nodes"):
+				limits[words[i]] = int(words[i+1])
+		player = Pentago.Player("engine", "computer", self.token)
+		if "depth" in limits:
+			player.searchDepth = limits["depth"]
+		elif "movetime" in limits or "nodes" in limits or "infinite" in words:
+			player.searchDepth = Pentago.NUM_CELLS
+		if self.token not in self.tt:
+			self.tt[self.token] = Pentago.TranspositionTable(self.ttSize)
+		search = Pentago.Search(player, self.tt[self.token])
+		search.stopEvent = self.stopEvent
+		search.onIteration = self.sendInfo
+		moveTime = limits["movetime"] / 1000.0 if "movetime" in limits else None
+		self.stopEvent.clear()
+		self.searchThread = threading.Thread(target=self.runSearch, \
+		    args=(search, self.board.copy(), player.searchDepth, moveTime, limits.get("nodes")))
+		self.searchThread.start()
+
+
+	def runSearch(self, search, board, depth, moveTime, nodeLimit):
+		if board.emptyCells==0 or Pentago.findWinnerBits(board.black, board.white) is not None:
+			self.send("bestmove none")
+			return
+		move, score = search.iterativeDeepening(board, depth, moveTime, nodeLimit)
+		self.send("bestmove " + Pentago.moveToString(move))
+
+
+	def sendInfo(self, search, depth, move, score):
+		stats = search.stats
+		pv = search.principalVariation(self.board, move, depth)
+		self.send("info depth " + str(depth) + " score " + str(int(score)) + \
+		          " nodes " + str(stats.nodes) + " time " + str(int(stats.elapsed*1000)) + \
+		          " nps " + str(int(stats.nodesPerSecond())) + \
+		          " pv " + " ".join(Pentago.moveToString(m) for m in pv))
+
+
+	def stop(self):
+		if self.searchThread is not None:
+			self.stopEvent.set()
+			self.searchThread.join()
+			self.searchThread = None
+
+
+	def command(self, line):
+	#---------------------------------------------------------------------------
+	# Carry out one command line.  Returns False after quit.
+	#---------------------------------------------------------------------------
+		words = line.split()
+		if not words:
+			return True
+		cmd = words[0]
+		if cmd=="quit":
+			self.stop()
+			return False
+		if cmd=="stop":
+			self.stop()
+		elif cmd=="isready":
+			self.send("readyok")
+		elif cmd=="uci":
+			self.send("id name Pentago nwp28_h")
+			self.send("option name ttsize type spin default " + str(1 << 16))
+			self.send("uciok")
+		elif cmd in ("position", "go", "newgame", "setoption", "board"):
+			# these need the search to be finished
+			if self.searchThread is not None and self.searchThread.is_alive():
+				self.stop()
+			try:
+				if cmd=="position":
+					self.setPosition(words[1:])
+				elif cmd=="go":
+					self.go(words[1:])
+				elif cmd=="newgame":
+					self.tt = { }
+				elif cmd=="setoption":
+					if len(words)==5 and words[1]=="name" and words[2].lower()=="ttsize" \
+					   and words[3]=="value":
+						self.ttSize = int(words[4])
+						self.tt = { }
+					else:
+						raise ValueError("unknown option")
+				else:
+					self.send(str(self.board).strip("\n"))
+					self.send("to move: " + self.token)
+			except ValueError as e:
+				self.send("info string error: " + str(e))
+		else:
+			self.send("info string unknown command: " + cmd)
+		return True
+
+
+	def run(self, lines=sys.stdin):
+		for line in lines:
+			if not self.command(line):
+				break
+		self.stop()
+
+
+
+if __name__ == "__main__":
+	Engine().run()
@@ -0,0 +1,249 @@
+#---------------------------------------------------------------------------
+# Monte Carlo tree search player
+# Chosen with "mcts" as the player type in the config file, e.g.
+#
+#   Bot
+#   mcts
+#   w
+#
+# or in the players of a server.py game.
+#
+# Settings (key=value lines of the config file, as for Pentago.py):
+#   playouts  playouts per move (default 1000)
+#   movetime  milliseconds per move; without playouts, the search uses
+#             the whole time
+#   uct       exploration constant of the UCT formula (default 1.4)
+#   playout   "random" (default) for uniformly random playouts, "greedy"
+#             to also take winning placements and block the opponent's
+#   seed      random seed
+#
+# The tree is kept between moves: when the opponent's reply was explored,
+# the search carries on from its node.
+#---------------------------------------------------------------------------
+
+import math
+import time
+import random
+import Pentago
+
+# A random rotation is 2*(block-1) + (1 if clockwise), as in move codes
+ROTATIONS = [ (k + 1, clockwise) for k in range(4) for clockwise in (False, True) ]
+
+
+class MCTSNode:
+#--------------------------------------------------------------------------------
+# The position after move, played by mover.  wins counts the playouts
+# through this node that mover won (a tie counts half).  untried is None
+# until the node is first expanded; result is the winner ("b", "w" or "tie")
+# if the game is over here.
+#--------------------------------------------------------------------------------
+	__slots__ = ("parent", "move", "mover", "children", "untried", "visits", "wins", "result")
+
+	def __init__ (self, parent, move, mover, result=None):
+		self.parent = parent
+		self.move = move
+		self.mover = mover
+		self.children = [ ]
+		self.untried = None
+		self.visits = 0
+		self.wins = 0.0
+		self.result = result
+
+
+
+def otherToken(token):
+	return "w" if token=="b" else "b"
+
+
+def randomPlayout(black, white, token, rng, greedy=False):
+#---------------------------------------------------------------------------
+# Play random moves from (black, white), token to move, to the end of the
+# game.  Returns the winner: "b", "w" or "tie".  With greedy, a placement
+# that wins is always taken, and one that stops the opponent's is taken
+# otherwise.
+#---------------------------------------------------------------------------
+	fullMask = Pentago.FULL_MASK
+	hasFive = Pentago.hasFive
+	rotateBits = Pentago.rotateBits
+	while True:
+		empty = ~(black | white) & fullMask
+		if empty==0:
+			return "tie"
+		mine = black if token=="b" else white
+		cell = -1
+		if greedy:
+			wins = Pentago.winningCells(mine, empty)
+			if wins:
+				return token
+			blocks = Pentago.winningCells(white if token=="b" else black, empty)
+			if blocks:
+				cell = (blocks & -blocks).bit_length() - 1
+		while cell < 0:
+			cell = rng.randrange(Pentago.NUM_CELLS)
+			if not empty >> cell & 1:
+				cell = -1
+		mine |= 1 << cell
+		if token=="b":
+			black = mine
+		else:
+			white = mine
+		if hasFive(mine):
+			return token
+		gameBlock, clockwise = ROTATIONS[rng.randrange(8)]
+		black = rotateBits(black, gameBlock, clockwise)
+		white = rotateBits(white, gameBlock, clockwise)
+		winner = Pentago.findWinnerBits(black, white)
+		if winner is not None:
+			return winner
+		token = "w" if token=="b" else "b"
+
+
+
+#--------------------------------------------------------------------------------
+
+class MCTSPlayer(Pentago.Player):
+#--------------------------------------------------------------------------------
+# A computer player choosing moves by UCT tree search with random playouts,
+# instead of alpha-beta search of the nwp28_h heuristic.
+#--------------------------------------------------------------------------------
+
+	def __init__ (self, name, playerType, token):
+		Pentago.Player.__init__(self, name, playerType, token)
+		self.playouts = 1000
+		self.uct = 1.4
+		self.greedy = False
+		self.rng = random.Random()
+		self.root = None
+		self.treeBoard = None
+		self.treeReuses = 0
+
+
+	def configure(self, settings):
+		Pentago.Player.configure(self, settings)
+		if "playouts" in settings:
+			self.playouts = int(settings["playouts"])
+			if self.playouts < 1:
+				raise ValueError("playouts must be at least 1")
+		elif "movetime" in settings:
+			self.playouts = None
+		if "uct" in settings:
+			self.uct = float(settings["uct"])
+		if "playout" in settings:
+			self.greedy = settings["playout"]=="greedy"
+		if "seed" in settings:
+			self.rng = random.Random(int(settings["seed"]))
+
+
+	def reuseTree(self, board, rootMoves=None):
+	#---------------------------------------------------------------------------
+	# The node of the last tree for board, the position after the opponent's
+	# reply, or None.  With rootMoves (move codes), a node that has explored
+	# other moves is not reused, and only rootMoves are left to try.
+	#---------------------------------------------------------------------------
+		if self.root is None:
+			return None
+		for child in self.root.children:
+			after = self.treeBoard.copy()
+			after.makeMove(child.move, child.mover)
+			if after.black==board.black and after.white==board.white:
+				if rootMoves is not None:
+					if any(grandchild.move not in rootMoves for grandchild in child.children):
+						return None
+					if child.untried is None:
+						child.untried = list(rootMoves)
+						self.rng.shuffle(child.untried)
+					else:
+						child.untried = [ m for m in child.untried if m in rootMoves ]
+				child.parent = None
+				return child
+		return None
+
+
+	def getComputerMove(self, board):
+		searchBoard = Pentago.PentagoBitboard(board.toString())
+		if Pentago.isGameOver(searchBoard):
+			self.root = None
+			return None
+		move = self.quickMove(searchBoard)
+		if move is not None:
+			self.root = None
+			return Pentago.moveToString(move)
+
+		startTime = time.time()
+		deadline = startTime + self.moveTime if self.moveTime else None
+		#when the opponent threatens, only the moves that stop it are searched
+		root = self.reuseTree(searchBoard, self.blockMoves)
+		if root is None:
+			root = MCTSNode(None, None, otherToken(self.token))
+			if self.blockMoves is not None:
+				root.untried = list(self.blockMoves)
+				self.rng.shuffle(root.untried)
+		else:
+			self.treeReuses += 1
+		count = 0
+		maxDepth = 0
+		while True:
+			#at least one playout, so that the root has a child to play
+			if count > 0 and self.playouts is not None and count >= self.playouts:
+				break
+			if count > 0 and deadline is not None and count & 15==0 and time.time() >= deadline:
+				break
+			maxDepth = max(maxDepth, self.runPlayout(root, searchBoard))
+			count += 1
+
+		best = max(root.children, key=lambda child: child.visits)
+		self.lastStats = Pentago.SearchStats()
+		self.lastStats.nodes = count
+		self.lastStats.depth = maxDepth
+		self.lastStats.elapsed = time.time() - startTime
+		#keep the subtree of the move played for the next move
+		best.parent = None
+		self.root = best
+		self.treeBoard = searchBoard.copy()
+		self.treeBoard.makeMove(best.move, self.token)
+		return Pentago.moveToString(best.move)
+
+
+	def runPlayout(self, root, rootBoard):
+	#---------------------------------------------------------------------------
+	# One round of selection, expansion, playout and backup from root.
+	# Returns the depth of the node the playout started from.
+	#---------------------------------------------------------------------------
+		node = root
+		board = rootBoard.copy()
+		depth = 0
+		#select, while every move of the node has been tried
+		while node.result is None and node.untried is not None and not node.untried:
+			scale = self.uct*math.sqrt(math.log(node.visits))
+			node = max(node.children, key=lambda child: child.wins/child.visits + \
+			                                    scale*math.sqrt(1.0/child.visits))
+			board.makeMove(node.move, node.mover)
+			depth += 1
+		#expand one untried move
+		if node.result is None:
+			if node.untried is None:
+				node.untried = list(board.getMoveCodes())
+				self.rng.shuffle(node.untried)
+			move = node.untried.pop()
+			mover = otherToken(node.mover)
+			board.makeMove(move, mover)
+			result = Pentago.findWinnerBits(board.black, board.white)
+			if result is None and board.emptyCells==0:
+				result = "tie"
+			child = MCTSNode(node, move, mover, result)
+			node.children.append(child)
+			node = child
+			depth += 1
+		#play out, and count the result up the tree
+		result = node.result
+		if result is None:
+			result = randomPlayout(board.black, board.white, otherToken(node.mover), \
+			                       self.rng, self.greedy)
+		while node is not None:
+			node.visits += 1
+			if result==node.mover:
+				node.wins += 1.0
+			elif result=="tie":
+				node.wins += 0.5
+			node = node.parent
+		return depth
@@ -0,0 +1,343 @@
+#!/usr/bin/python
+
+#---------------------------------------------------------------------------
+# Pentago game records
+# List the games of a game record file (written by Pentago.py --record and
+# selfplay.py --record), print them as text transcripts, or convert text
+# transcripts (transcript_<timestamp>.txt) into a record file.
+#
+#   python3 records.py [-l] file
+#   python3 records.py -p file
+#   python3 records.py -o games.pgr transcript_*.txt
+#
+# Options:
+#   -l, --list      one line per game: players, result, plies (the default)
+#   -p, --print     print the games in the layout of a text transcript
+#   -o, --output    append the given text transcripts to this record file
+#
+# Pentago.py and selfplay.py write record files with GameRecordWriter.
+#---------------------------------------------------------------------------
+
+import sys, getopt
+import os
+import re
+import struct
+import Pentago
+
+#--------------------------------------------------------------------------------
+# Game record files:
+# Many games, appended one after another.  A 6-byte header (RECORD_HEADER:
+# magic, version) starts the file.  Each game is RECORD_GAME (number of
+# plies, result, flags, start time), then the two players, each RECORD_PLAYER
+# (token, lengths of type and name) followed by the type and name in UTF-8,
+# then one RECORD_PLY per ply: the position before the move, as 72 bits
+# (black | white << 36, in a 64-bit and an 8-bit part), and the move code.
+# With RECORD_STATS_FLAG, each ply is followed by RECORD_STATS: depth, nodes
+# and seconds of the move's search, all 0 if there was none.  Last comes the
+# final position, as RECORD_POSITION.
+#--------------------------------------------------------------------------------
+RECORD_MAGIC = b"PGR1"
+RECORD_VERSION = 1
+RECORD_HEADER = struct.Struct("<4sH")
+RECORD_GAME = struct.Struct("<HBBd")
+RECORD_PLAYER = struct.Struct("<cBB")
+RECORD_PLY = struct.Struct("<QBH")
+RECORD_STATS = struct.Struct("<BIf")
+RECORD_POSITION = struct.Struct("<QB")
+RECORD_STATS_FLAG = 1
+# results, by their number in RECORD_GAME; None for a game left unfinished
+RECORD_RESULTS = [ None, "b", "w", "tie" ]
+
+def packPosition(black, white):
+	bits = black | white << Pentago.NUM_CELLS
+	return bits & 0xFFFFFFFFFFFFFFFF, bits >> 64
+
+def unpackPosition(low, high):
+	bits = low | high << 64
+	return bits & Pentago.FULL_MASK, bits >> Pentago.NUM_CELLS
+
+class GameRecord:
+#--------------------------------------------------------------------------------
+# One game of a record file.  players holds (name, type, token) for each
+# player, in the order of the game; plies holds (black, white, move code),
+# the position before each move and the move; stats holds (depth, nodes,
+# seconds) for each ply, or is None; final is (black, white) at the end.
+#--------------------------------------------------------------------------------
+
+	def __init__ (self, players, plies, final, result=None, stats=None, timestamp=0.0):
+		self.players = players
+		self.plies = plies
+		self.final = final
+		self.result = result
+		self.stats = stats
+		self.timestamp = timestamp
+
+
+	def moves(self):
+		return [ Pentago.moveToString(move) for black, white, move in self.plies ]
+
+
+class GameRecordWriter:
+#--------------------------------------------------------------------------------
+# Appends games to a record file, creating it if missing.  A game is built
+# up with startGame(), addPly() and endGame(), or given whole to
+# writeGame(); finished games are kept in a buffer and written out once it
+# holds bufferSize bytes, and by flush() and close().
+#--------------------------------------------------------------------------------
+
+	def __init__ (self, fileName, bufferSize=1 << 16):
+		self.fileName = fileName
+		self.bufferSize = bufferSize
+		self.file = open(fileName, "ab")
+		if self.file.tell()==0:
+			self.file.write(RECORD_HEADER.pack(RECORD_MAGIC, RECORD_VERSION))
+		else:
+			f = open(fileName, "rb")
+			checkRecordHeader(f.read(RECORD_HEADER.size), fileName)
+			f.close()
+		self.buffer = bytearray()
+		self.game = None
+		self.plies = 0
+
+
+	def startGame(self, players, timestamp=0.0, withStats=False):
+	#---------------------------------------------------------------------------
+	# players: (name, type, token) for each of the two players.
+	#---------------------------------------------------------------------------
+		self.game = (players, timestamp, withStats, bytearray())
+		self.plies = 0
+
+
+	def addPly(self, black, white, move, stats=None):
+	#---------------------------------------------------------------------------
+	# The position before the move, and the move (a move code or string).
+	# stats is (depth, nodes, seconds) or None; it is only kept in a game
+	# started withStats.
+	#---------------------------------------------------------------------------
+		if isinstance(move, str):
+			move = Pentago.moveFromString(move)
+		players, timestamp, withStats, data = self.game
+		data += RECORD_PLY.pack(*packPosition(black, white), move)
+		if withStats:
+			depth, nodes, seconds = stats if stats is not None else (0, 0, 0.0)
+			data += RECORD_STATS.pack(min(depth, 255), min(nodes, 0xFFFFFFFF), seconds)
+		self.plies += 1
+
+
+	def endGame(self, black, white, result=None):
+	#---------------------------------------------------------------------------
+	# The final position and the winner ("b", "w", "tie", or None if the game
+	# was not finished).
+	#---------------------------------------------------------------------------
+		players, timestamp, withStats, data = self.game
+		self.buffer += RECORD_GAME.pack(self.plies, RECORD_RESULTS.index(result), \
+		                                RECORD_STATS_FLAG if withStats else 0, timestamp)
+		for name, playerType, token in players:
+			name = name.encode("utf-8")[:255]
+			playerType = playerType.encode("utf-8")[:255]
+			self.buffer += RECORD_PLAYER.pack(token.encode(), len(playerType), len(name))
+			self.buffer += playerType + name
+		self.buffer += data
+		self.buffer += RECORD_POSITION.pack(*packPosition(black, white))
+		self.game = None
+		if len(self.buffer) >= self.bufferSize:
+			self.flush()
+
+
+	def writeGame(self, record):
+	#---------------------------------------------------------------------------
+	# Append a whole GameRecord.
+	#---------------------------------------------------------------------------
+		self.startGame(record.players, record.timestamp, record.stats is not None)
+		for n, (black, white, move) in enumerate(record.plies):
+			self.addPly(black, white, move, record.stats[n] if record.stats is not None else None)
+		self.endGame(record.final[0], record.final[1], record.result)
+
+
+	def flush(self):
+		self.file.write(self.buffer)
+		self.file.flush()
+		self.buffer = bytearray()
+
+
+	def close(self):
+		self.flush()
+		self.file.close()
+
+
+def checkRecordHeader(data, fileName):
+	if len(data) < RECORD_HEADER.size or \
+	   RECORD_HEADER.unpack_from(data, 0)!=(RECORD_MAGIC, RECORD_VERSION):
+		raise ValueError(fileName + " is not a game record file of version " + \
+		                 str(RECORD_VERSION))
+
+def readGameRecords(fileName):
+#---------------------------------------------------------------------------
+# Generator of the GameRecords of a record file, read one at a time.
+# Raises ValueError for a file that is not a record file, or ends in the
+# middle of a game.
+#---------------------------------------------------------------------------
+	f = open(fileName, "rb")
+	try:
+		checkRecordHeader(f.read(RECORD_HEADER.size), fileName)
+		def read(size):
+			data = f.read(size)
+			if len(data)!=size:
+				raise ValueError(fileName + " ends in the middle of a game")
+			return data
+		while True:
+			data = f.read(RECORD_GAME.size)
+			if not data:
+				break
+			if len(data)!=RECORD_GAME.size:
+				raise ValueError(fileName + " ends in the middle of a game")
+			plyCount, result, flags, timestamp = RECORD_GAME.unpack(data)
+			players = [ ]
+			for n in range(2):
+				token, typeLength, nameLength = RECORD_PLAYER.unpack(read(RECORD_PLAYER.size))
+				data = read(typeLength + nameLength)
+				players.append((data[typeLength:].decode("utf-8", "replace"), \
+				                data[:typeLength].decode("utf-8", "replace"), token.decode()))
+			withStats = flags & RECORD_STATS_FLAG
+			plySize = RECORD_PLY.size + (RECORD_STATS.size if withStats else 0)
+			data = read(plyCount*plySize)
+			plies = [ ]
+			stats = [ ] if withStats else None
+			for offset in range(0, len(data), plySize):
+				low, high, move = RECORD_PLY.unpack_from(data, offset)
+				black, white = unpackPosition(low, high)
+				plies.append((black, white, move))
+				if withStats:
+					stats.append(RECORD_STATS.unpack_from(data, offset + RECORD_PLY.size))
+			final = unpackPosition(*RECORD_POSITION.unpack(read(RECORD_POSITION.size)))
+			yield GameRecord(players, plies, final, RECORD_RESULTS[result], stats, timestamp)
+	finally:
+		f.close()
+
+
+#--------------------------------------------------------------------------------
+# Text transcripts
+#--------------------------------------------------------------------------------
+
+PLAYER_LINE = re.compile(r"Player (.*): type=(\S+), plays (Black|White) tokens$")
+STATS_FIELDS = re.compile(r"depth=(\d+) nodes=(\d+) time=([0-9.]+)s")
+
+
+def boardString(black, white):
+	board = Pentago.PentagoBitboard()
+	board.black = black
+	board.white = white
+	return board.toString()
+
+
+def readTranscript(fileName):
+#---------------------------------------------------------------------------
+# The GameRecord of a text transcript.  The start time is taken from the
+# file name; the stats column, if any, gives the stats of the plies.
+#---------------------------------------------------------------------------
+	f = open(fileName, "r")
+	lines = f.read().splitlines()
+	f.close()
+	players = [ ]
+	plies = [ ]
+	stats = [ ]
+	final = None
+	for line in lines:
+		match = PLAYER_LINE.match(line)
+		if match is not None:
+			players.append((match.group(1), match.group(2), match.group(3)[0].lower()))
+		elif "\t" in line:
+			fields = line.split("\t")
+			board = Pentago.PentagoBitboard(fields[0])
+			if fields[1]=="":
+				final = (board.black, board.white)
+				continue
+			plies.append((board.black, board.white, Pentago.moveFromString(fields[1])))
+			match = STATS_FIELDS.search(fields[2]) if len(fields) > 2 else None
+			if match is not None:
+				stats.append((int(match.group(1)), int(match.group(2)), float(match.group(3))))
+			else:
+				stats.append(None)
+	if len(players)!=2:
+		raise ValueError(fileName + " is not a Pentago transcript")
+	if final is None:
+		# no last line: play the last move
+		board = Pentago.PentagoBitboard()
+		if plies:
+			board.black, board.white, move = plies[-1]
+			board = board.playMove(Pentago.moveToString(move), \
+			                       players[(len(plies) - 1) % 2][2])[0]
+		final = (board.black, board.white)
+	result = Pentago.findWinnerBits(final[0], final[1])
+	if result is None and (final[0] | final[1])==Pentago.FULL_MASK:
+		result = "tie"
+	if any(entry is not None for entry in stats):
+		stats = [ entry if entry is not None else (0, 0, 0.0) for entry in stats ]
+	else:
+		stats = None
+	timestamp = 0.0
+	match = re.search(r"transcript_([0-9.]+)\.txt$", fileName)
+	if match is not None:
+		timestamp = float(match.group(1))
+	return GameRecord(players, plies, final, result, stats, timestamp)
+
+
+def convert(output, fileNames):
+#---------------------------------------------------------------------------
+# Append the transcripts to the record file output.  Returns the number of
+# games written.
+#---------------------------------------------------------------------------
+	writer = GameRecordWriter(output)
+	try:
+		for fileName in fileNames:
+			writer.writeGame(readTranscript(fileName))
+	finally:
+		writer.close()
+	return len(fileNames)
+
+
+def printGame(record):
+#---------------------------------------------------------------------------
+# The game as Pentago.py writes a transcript, stats as depth, nodes and time.
+#---------------------------------------------------------------------------
+	print()
+	for name, playerType, token in record.players:
+		print("Player " + name + ": type=" + playerType + ", plays " + \
+		      Pentago.descr[token] + " tokens")
+	for n, (black, white, move) in enumerate(record.plies):
+		line = boardString(black, white) + "\t" + Pentago.moveToString(move)
+		if record.stats is not None and record.stats[n][1] > 0:
+			depth, nodes, seconds = record.stats[n]
+			line += "\tdepth=%d nodes=%d time=%.3fs" % (depth, nodes, seconds)
+		print(line)
+	print(boardString(*record.final) + "\t")
+
+
+if __name__ == "__main__":
+	doPrint = False
+	output = None
+	opts, args = getopt.getopt(sys.argv[1:], "lpo:", ["list", "print", "output="])
+	for opt, arg in opts:
+		if opt in ("-l", "--list"):
+			doPrint = False
+		elif opt in ("-p", "--print"):
+			doPrint = True
+		elif opt in ("-o", "--output"):
+			output = arg
+	if (output is None and len(args)!=1) or not args:
+		print("Usage: python3 records.py [-l | -p] file")
+		print("       python3 records.py -o file transcript ...")
+		sys.exit(2)
+
+	if output is not None:
+		games = convert(output, args)
+		print(output + ": " + str(games) + " games added, " + \
+		      str(os.path.getsize(output)) + " bytes")
+	else:
+		for n, record in enumerate(readGameRecords(args[0])):
+			if doPrint:
+				printGame(record)
+			else:
+				print("%d\t%s\t%s\t%s\t%d plies" % (n, \
+				      " - ".join(name + " (" + token + ")" for name, playerType, token in record.players), \
+				      record.result or "unfinished", record.timestamp, len(record.plies)))
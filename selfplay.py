@@ -0,0 +1,238 @@
+#!/usr/bin/python
+
+#---------------------------------------------------------------------------
+# Pentago self-play
+# Plays many games between two computer players without any console output,
+# spread over worker processes, and writes one JSON file of results: wins
+# of each player, ties, game lengths and move times.
+#
+#   python3 selfplay.py -c testconfig.txt -n 100 -j 4
+#
+# Options:
+#   -c, --config    player config file, as for Pentago.py (required)
+#   -n, --games     number of games (default 10)
+#   -j, --jobs      worker processes (default 1)
+#   -b, --board     36-character starting position, Player 1 to play first
+#   -r, --random    number of random moves to play before the players start
+#   -s, --seed      random seed for the openings (default 0)
+#   -a, --alternate swap which player moves first in every other game
+#   -o, --output    results file (default selfplay_<timestamp>.json)
+#   -g, --record    also append the games, with the search stats of each
+#                   move, to this game record file (see records.py)
+#
+# Settings from the config file (movetime=..., depth=...) apply as they do
+# in Pentago.py, except that each game is searched in a single process.
+#---------------------------------------------------------------------------
+
+import sys, getopt
+import time
+import json
+import random
+import concurrent.futures
+import Pentago
+import records
+
+# Players of the current worker process, built once by initWorker()
+workerPlayers = None
+
+# Random openings drawn before giving up on finding one that leaves the
+# game going
+OPENING_DRAWS = 1000
+
+
+def initWorker(configFile):
+	global workerPlayers
+	player, settings = Pentago.readConfig(configFile)
+	for p in player:
+		p.configure(settings)
+		p.workers = 1
+	workerPlayers = player
+
+
+def randomOpening(boardString, plies, firstToken, rng):
+#---------------------------------------------------------------------------
+# Play plies random moves from boardString, alternating colors starting
+# with firstToken.  Openings that end the game are drawn again, up to
+# OPENING_DRAWS times; then ValueError is raised.
+#---------------------------------------------------------------------------
+	for draw in range(OPENING_DRAWS):
+		board = Pentago.PentagoBitboard(boardString)
+		token = firstToken
+		for ply in range(plies):
+			if Pentago.isGameOver(board):
+				break
+			board.makeMove(rng.choice(board.getMoveCodes()), token)
+			token = "w" if token=="b" else "b"
+		if not Pentago.isGameOver(board):
+			return board
+	raise ValueError("no random opening of " + str(plies) + " moves in " + \
+	                 str(OPENING_DRAWS) + " draws left the game going")
+
+
+def playGame(gameNumber, boardString, plies, seed, swap, withStats=False):
+#---------------------------------------------------------------------------
+# Play one game in a worker process.  The first player moves first unless
+# swap is set.  Returns a dictionary describing the game, with its start
+# time; withStats adds the (depth, nodes, seconds) of each move's search,
+# or None.
+#---------------------------------------------------------------------------
+	gameStart = time.time()
+	rng = random.Random(seed*1000003 + gameNumber)
+	order = [ 1, 0 ] if swap else [ 0, 1 ]
+	board = randomOpening(boardString, plies, workerPlayers[order[0]].token, rng)
+	startBoard = board.toString()
+	moveTimes = [ [ ], [ ] ]
+	moves = [ ]
+	moveStats = [ ]
+	current = plies % 2
+	winner = None
+	while True:
+		p = workerPlayers[order[current]]
+		startTime = time.time()
+		move = p.getComputerMove(board)
+		moveTimes[order[current]].append(time.time() - startTime)
+		moves.append(move)
+		stats = p.lastStats
+		moveStats.append(None if stats is None else (stats.depth, stats.nodes, stats.elapsed))
+		board.makeMove(move, p.token)
+		winner = Pentago.findWinnerBits(board.black, board.white)
+		if winner is not None or board.emptyCells==0:
+			break
+		current = 1 - current
+	for p in workerPlayers:
+		p.close()
+	if winner is None:
+		winner = "tie"
+	game = { "game": gameNumber, "startTime": gameStart, "start": startBoard, "first": order[0], \
+	         "winner": winner, "length": len(moves), "moves": moves, \
+	         "end": board.toString(), "moveTimes": moveTimes }
+	if withStats:
+		game["moveStats"] = moveStats
+	return game
+
+
+def gameRecord(game, player):
+#---------------------------------------------------------------------------
+# The GameRecord of a game dictionary from playGame(), with stats.
+#---------------------------------------------------------------------------
+	order = [ game["first"], 1 - game["first"] ]
+	board = Pentago.PentagoBitboard(game["start"])
+	plies = [ ]
+	for n, move in enumerate(game["moves"]):
+		code = Pentago.moveFromString(move)
+		plies.append((board.black, board.white, code))
+		board.makeMove(code, player[order[n % 2]].token)
+	stats = [ entry if entry is not None else (0, 0, 0.0) for entry in game["moveStats"] ]
+	return records.GameRecord([ (player[i].name, player[i].playerType, player[i].token) \
+	                            for i in order ], \
+	                          plies, (board.black, board.white), game["winner"], stats, \
+	                          game["startTime"])
+
+
+def summarize(games, player):
+#---------------------------------------------------------------------------
+# Aggregate the game dictionaries into the results of the whole run.
+#---------------------------------------------------------------------------
+	results = { "games": len(games), "ties": 0, "players": [ ] }
+	lengths = [ game["length"] for game in games ]
+	for i in range(2):
+		times = [ t for game in games for t in game["moveTimes"][i] ]
+		results["players"].append({ "name": player[i].name, "token": player[i].token, \
+		    "wins": sum(1 for game in games if game["winner"]==player[i].token), \
+		    "moves": len(times), \
+		    "meanMoveTime": sum(times)/len(times) if times else 0.0, \
+		    "maxMoveTime": max(times) if times else 0.0 })
+	results["ties"] = sum(1 for game in games if game["winner"]=="tie")
+	results["meanLength"] = sum(lengths)/len(lengths) if lengths else 0.0
+	results["minLength"] = min(lengths) if lengths else 0
+	results["maxLength"] = max(lengths) if lengths else 0
+	results["gameList"] = games
+	return results
+
+
+def runSelfPlay(configFile, games, jobs=1, boardString="", plies=0, seed=0, alternate=False, \
+                record=None):
+#---------------------------------------------------------------------------
+# Play games on jobs worker processes and return the summarized results.
+# With record, a record file name, the games are also appended to it as
+# they finish.
+#---------------------------------------------------------------------------
+	player, settings = Pentago.readConfig(configFile)
+	for p in player:
+		if p.playerType!="computer":
+			raise ValueError("self-play needs two computer players, " + p.name + \
+			                 " is " + p.playerType)
+	board = Pentago.PentagoBitboard(boardString)
+	if Pentago.isGameOver(board):
+		raise ValueError("the start board is a finished game")
+	if plies >= board.emptyCells:
+		raise ValueError("the start board has room for fewer than " + str(plies + 1) + " moves")
+	startTime = time.time()
+	writer = records.GameRecordWriter(record) if record is not None else None
+	try:
+		with concurrent.futures.ProcessPoolExecutor(jobs, initializer=initWorker, \
+		                                            initargs=(configFile,)) as pool:
+			futures = [ pool.submit(playGame, n, boardString, plies, seed, alternate and n%2==1, \
+			                        writer is not None) \
+			            for n in range(games) ]
+			gameList = [ ]
+			for future in futures:
+				game = future.result()
+				if writer is not None:
+					writer.writeGame(gameRecord(game, player))
+					del game["moveStats"]
+				gameList.append(game)
+	finally:
+		if writer is not None:
+			writer.close()
+	results = summarize(gameList, player)
+	results["settings"] = settings
+	results["seconds"] = time.time() - startTime
+	return results
+
+
+if __name__ == "__main__":
+	configFile = None
+	games = 10
+	jobs = 1
+	boardString = ""
+	plies = 0
+	seed = 0
+	alternate = False
+	output = "selfplay_" + str(time.time()) + ".json"
+	record = None
+
+	opts, args = getopt.getopt(sys.argv[1:], "c:n:j:b:r:s:ao:g:", \
+	               ["config=", "games=", "jobs=", "board=", "random=", "seed=", \
+	                "alternate", "output=", "record="])
+	for opt, arg in opts:
+		if opt in ("-c", "--config"):
+			configFile = arg
+		elif opt in ("-n", "--games"):
+			games = int(arg)
+		elif opt in ("-j", "--jobs"):
+			jobs = int(arg)
+		elif opt in ("-b", "--board"):
+			boardString = arg
+		elif opt in ("-r", "--random"):
+			plies = int(arg)
+		elif opt in ("-s", "--seed"):
+			seed = int(arg)
+		elif opt in ("-a", "--alternate"):
+			alternate = True
+		elif opt in ("-o", "--output"):
+			output = arg
+		elif opt in ("-g", "--record"):
+			record = arg
+	if configFile is None:
+		print("Usage: python3 selfplay.py -c config [-n games] [-j jobs] [-b board] " + \
+		      "[-r plies] [-s seed] [-a] [-o output] [-g record]")
+		sys.exit(2)
+
+	results = runSelfPlay(configFile, games, jobs, boardString, plies, seed, alternate, record)
+	f = open(output, "w")
+	json.dump(results, f, indent=1)
+	f.close()
+	print(output + ": " + str(results["games"]) + " games, " + \
+	      ", ".join(p["name"] + " " + str(p["wins"]) for p in results["players"]) + \
+	      ", ties " + str(results["ties"]))
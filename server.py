@@ -0,0 +1,403 @@
+#!/usr/bin/python
+
+#---------------------------------------------------------------------------
+# Pentago game server
+# Hosts many games in one process.  Clients connect over TCP (or a Unix
+# socket) and send one JSON object per line; every request gets one JSON
+# line back, carrying the request's "id" so that replies can be matched.
+#
+#   python3 server.py [-H host] [-p port] [-u socket] [-j jobs]
+#
+# Options:
+#   -H, --host      address to listen on (default 127.0.0.1)
+#   -p, --port      TCP port (default 8728)
+#   -u, --unix      listen on this Unix socket instead of TCP
+#   -j, --jobs      processes searching computer moves (default 2)
+#
+# Requests ("cmd" names the request):
+#   {"cmd": "new", "board": "<36 characters>",
+#    "players": [["Ann", "human", "b"], ["Bot", "computer", "w"]],
+#    "settings": {"movetime": "500"}}
+#         start a game; Player 1 moves first, types are human, computer or
+#         one of Pentago.PLAYER_TYPES (such as mcts), settings are key=value
+#         settings of a config file, limited to those in GAME_SETTINGS.
+#         Replies with the new game's "game".
+#   {"cmd": "move", "game": 1, "move": "2/3 1L"}
+#         a human player's move; the computer replies are played as well
+#   {"cmd": "go", "game": 1}
+#         let the computer players move until a human is to move
+#   {"cmd": "state", "game": 1}
+#   {"cmd": "close", "game": 1}
+#
+# Replies have "ok" (and "error" if it is false).  Game replies also give the
+# board, the moves played by the request, the token to move and the winner
+# ("b", "w", "tie" or null).
+#
+# Computer moves are searched in a process pool of the given size; the event
+# loop itself never searches.  Requests for one game are queued and handled
+# in order, and a client that sends faster than its games are played is
+# slowed down: once a game's queue, or the client's requests in progress,
+# are full, the server stops reading from that client.  The games of a
+# connection are closed when it closes.
+#---------------------------------------------------------------------------
+
+import sys, getopt
+import json
+import asyncio
+import concurrent.futures
+import Pentago
+
+DEFAULT_PORT = 8728
+GAME_QUEUE_SIZE = 8         # requests waiting for one game
+CLIENT_PENDING = 32         # requests in progress for one connection
+MAX_LINE = 1 << 16          # longest request line
+
+# The settings a client may give a game, with their lowest and highest
+# values: nothing that reads or writes files on the server, or searches
+# without a bound
+GAME_SETTINGS = {
+  "movetime": (1, 10000),
+  "nodes": (1, 10000000),
+  "depth": (1, 4),
+  "endgame": (0, 6),
+  "threats": (0, 2),
+  "playouts": (1, 100000),
+  "ttsize": (1, 1 << 18)
+}
+
+# In pool processes: computer players by (game, token), so each keeps its
+# transposition table from one move to the next when it lands on the same
+# process.  At most WORKER_PLAYERS are kept.
+WORKER_PLAYERS = 64
+workerPlayers = { }
+
+
+def computeMove(gameId, playerClass, name, token, settings, boardString):
+#---------------------------------------------------------------------------
+# Pool task: the computer move of player (name, token), of playerClass (a
+# Player subclass), on boardString.  Returns (move, search statistics as a
+# dictionary).
+#---------------------------------------------------------------------------
+	key = (gameId, token)
+	player = workerPlayers.pop(key, None)
+	if player is None:
+		player = playerClass(name, "computer", token)
+		player.configure(settings)
+		player.workers = 1
+	workerPlayers[key] = player
+	while len(workerPlayers) > WORKER_PLAYERS:
+		workerPlayers.pop(next(iter(workerPlayers))).close()
+	move = player.getComputerMove(Pentago.PentagoBitboard(boardString))
+	stats = player.lastStats.asDict() if player.lastStats is not None else None
+	return move, stats
+
+
+class RequestError(Exception):
+#---------------------------------------------------------------------------
+# A request that cannot be carried out; its message goes back to the client.
+#---------------------------------------------------------------------------
+	pass
+
+
+
+#--------------------------------------------------------------------------------
+
+class Game:
+#--------------------------------------------------------------------------------
+# One game: the board, the two players, and the queue of its requests.
+#--------------------------------------------------------------------------------
+
+	def __init__ (self, gameId, boardString, player, settings):
+		self.gameId = gameId
+		self.board = Pentago.PentagoBitboard(boardString)
+		self.player = player
+		self.settings = settings
+		self.current = 0
+		self.moves = [ ]
+		self.winner = Pentago.findWinnerBits(self.board.black, self.board.white)
+		if self.winner is None and self.board.emptyCells==0:
+			self.winner = "tie"
+		self.queue = asyncio.Queue(GAME_QUEUE_SIZE)
+		self.task = None
+
+
+	def playMove(self, move):
+	#---------------------------------------------------------------------------
+	# Play move for the player to move.  Returns a description of the move.
+	#---------------------------------------------------------------------------
+		p = self.player[self.current]
+		self.board, rotated = self.board.playMove(move, p.token)
+		self.moves.append(move)
+		winner = Pentago.findWinnerBits(self.board.black, self.board.white)
+		if winner is not None:
+			self.winner = winner
+		elif self.board.emptyCells==0:
+			self.winner = "tie"
+		self.current = 1 - self.current
+		return { "player": p.name, "token": p.token, "move": move, "rotated": rotated }
+
+
+	def state(self):
+		return { "game": self.gameId, "board": self.board.toString(), \
+		         "toMove": None if self.winner else self.player[self.current].token, \
+		         "winner": self.winner, "moveCount": len(self.moves) }
+
+
+
+#--------------------------------------------------------------------------------
+
+class PentagoServer:
+#--------------------------------------------------------------------------------
+# The games, the search pool, and the handling of client connections.
+#--------------------------------------------------------------------------------
+
+	def __init__ (self, jobs=2):
+		self.jobs = jobs
+		self.pool = concurrent.futures.ProcessPoolExecutor(jobs)
+		self.games = { }
+		self.nextGameId = 1
+
+
+	async def computerMoves(self, game):
+	#---------------------------------------------------------------------------
+	# Play computer moves until the game ends or a human is to move.
+	#---------------------------------------------------------------------------
+		played = [ ]
+		loop = asyncio.get_running_loop()
+		while game.winner is None and game.player[game.current].playerType=="computer":
+			p = game.player[game.current]
+			move, stats = await loop.run_in_executor(self.pool, computeMove, game.gameId, \
+			                  type(p), p.name, p.token, game.settings, game.board.toString())
+			result = game.playMove(move)
+			result["stats"] = stats
+			played.append(result)
+		return played
+
+
+	async def handleGameRequest(self, game, request):
+		cmd = request.get("cmd")
+		played = [ ]
+		if cmd=="move":
+			if game.winner is not None:
+				raise RequestError("game is over")
+			p = game.player[game.current]
+			if p.playerType!="human":
+				raise RequestError("it is the computer's turn, send go")
+			move = request.get("move")
+			if move not in game.board.getMoves():
+				raise RequestError("illegal move: " + str(move))
+			played.append(game.playMove(move))
+			played.extend(await self.computerMoves(game))
+		elif cmd=="go":
+			played.extend(await self.computerMoves(game))
+		elif cmd!="state":
+			raise RequestError("unknown command: " + str(cmd))
+		reply = game.state()
+		reply["moves"] = played
+		return reply
+
+
+	async def runGame(self, game):
+	#---------------------------------------------------------------------------
+	# Handle the queued requests of game, one at a time.
+	#---------------------------------------------------------------------------
+		while True:
+			request, reply = await game.queue.get()
+			try:
+				reply(await self.handleGameRequest(game, request))
+			except RequestError as e:
+				reply({ "ok": False, "error": str(e) })
+			except asyncio.CancelledError:
+				reply({ "ok": False, "error": "game closed" })
+				raise
+			except Exception as e:
+				reply({ "ok": False, "error": "internal error: " + repr(e) })
+
+
+	def newGame(self, request):
+		boardString = request.get("board", "")
+		if not isinstance(boardString, str) or \
+		   (boardString and (len(boardString)!=Pentago.NUM_CELLS or \
+		                     any(c not in "bw." for c in boardString))):
+			raise RequestError("board must be 36 characters of b, w and .")
+		spec = request.get("players", [ [ "Player", "human", "b" ], [ "Computer", "computer", "w" ] ])
+		try:
+			spec = [ [ str(field) for field in fields ] for fields in spec ]
+			if len(spec)!=2 or any(len(fields)!=3 for fields in spec):
+				raise ValueError
+		except (TypeError, ValueError):
+			raise RequestError("players must be two [name, type, token] lists")
+		playerTypes = [ "human", "computer" ] + sorted(Pentago.PLAYER_TYPES)
+		if sorted(token for name, playerType, token in spec)!=[ "b", "w" ] or \
+		   any(playerType.lower() not in playerTypes for name, playerType, token in spec):
+			raise RequestError("players need the tokens b and w, and types " + \
+			                   ", ".join(playerTypes))
+		player = [ Pentago.makePlayer(name, playerType, token) for name, playerType, token in spec ]
+		settings = self.gameSettings(request.get("settings", { }))
+		for p in player:
+			p.configure(settings)
+		game = Game(self.nextGameId, boardString, player, settings)
+		self.nextGameId += 1
+		self.games[game.gameId] = game
+		game.task = asyncio.get_running_loop().create_task(self.runGame(game))
+		return game
+
+
+	def gameSettings(self, settings):
+	#---------------------------------------------------------------------------
+	# The settings of a new game request, checked against GAME_SETTINGS, as
+	# strings for Player.configure().
+	#---------------------------------------------------------------------------
+		if not isinstance(settings, dict):
+			raise RequestError("settings must be a JSON object")
+		checked = { }
+		for key, value in settings.items():
+			key = str(key).lower()
+			if key not in GAME_SETTINGS:
+				raise RequestError("unknown setting: " + key + " (settings are " + \
+				                   ", ".join(sorted(GAME_SETTINGS)) + ")")
+			low, high = GAME_SETTINGS[key]
+			try:
+				number = int(str(value))
+			except ValueError:
+				number = None
+			if number is None or not low <= number <= high:
+				raise RequestError(key + " must be a number from " + str(low) + \
+				                   " to " + str(high))
+			checked[key] = str(number)
+		return checked
+
+
+	def getGame(self, gameId):
+		game = self.games.get(gameId) if isinstance(gameId, int) else None
+		if game is None:
+			raise RequestError("no game " + str(gameId))
+		return game
+
+
+	def closeGame(self, gameId):
+		game = self.getGame(gameId)
+		del self.games[gameId]
+		game.task.cancel()
+		for p in game.player:
+			p.close()
+		while not game.queue.empty():
+			request, reply = game.queue.get_nowait()
+			reply({ "ok": False, "error": "game closed" })
+
+
+	async def handleClient(self, reader, writer):
+	#---------------------------------------------------------------------------
+	# Read the requests of one connection.  new and close are answered at
+	# once; the others go on their game's queue and are answered when done.
+	#---------------------------------------------------------------------------
+		loop = asyncio.get_running_loop()
+		pending = asyncio.Semaphore(CLIENT_PENDING)
+		writeLock = asyncio.Lock()
+		sending = set()
+		# ids of the games this connection started
+		ownGames = set()
+
+		async def send(reply):
+			async with writeLock:
+				try:
+					writer.write((json.dumps(reply) + "\n").encode())
+					await writer.drain()
+				except ConnectionError:
+					pass
+
+		def replier(requestId):
+			def reply(result):
+				result.setdefault("ok", True)
+				result["id"] = requestId
+				task = loop.create_task(send(result))
+				sending.add(task)
+				task.add_done_callback(sending.discard)
+				pending.release()
+			return reply
+
+		try:
+			while True:
+				await pending.acquire()
+				try:
+					line = await reader.readline()
+				except ValueError:
+					await send({ "ok": False, "error": "request too long" })
+					break
+				if not line:
+					break
+				reply = replier(None)
+				try:
+					request = json.loads(line)
+					if not isinstance(request, dict):
+						raise RequestError("request must be a JSON object")
+					reply = replier(request.get("id"))
+					cmd = request.get("cmd")
+					if cmd=="new":
+						game = self.newGame(request)
+						ownGames.add(game.gameId)
+						reply(game.state())
+					elif cmd=="close":
+						self.closeGame(request.get("game"))
+						ownGames.discard(request.get("game"))
+						reply({ "game": request.get("game") })
+					else:
+						game = self.getGame(request.get("game"))
+						await game.queue.put((request, reply))
+				except (RequestError, json.JSONDecodeError) as e:
+					reply({ "ok": False, "error": str(e) })
+				except Exception as e:
+					reply({ "ok": False, "error": "internal error: " + repr(e) })
+			# wait for the replies still to come (this loop holds one count)
+			for i in range(CLIENT_PENDING-1):
+				await pending.acquire()
+			if sending:
+				await asyncio.gather(*sending)
+		except ConnectionError:
+			pass
+		finally:
+			for gameId in ownGames:
+				if gameId in self.games:
+					self.closeGame(gameId)
+			writer.close()
+
+
+	async def serve(self, host="127.0.0.1", port=DEFAULT_PORT, unixPath=None):
+		if unixPath is not None:
+			server = await asyncio.start_unix_server(self.handleClient, unixPath, limit=MAX_LINE)
+		else:
+			server = await asyncio.start_server(self.handleClient, host, port, limit=MAX_LINE)
+		async with server:
+			await server.serve_forever()
+
+
+	def shutdown(self):
+		self.pool.shutdown(cancel_futures=True)
+
+
+
+if __name__ == "__main__":
+	host = "127.0.0.1"
+	port = DEFAULT_PORT
+	unixPath = None
+	jobs = 2
+	opts, args = getopt.getopt(sys.argv[1:], "H:p:u:j:", ["host=", "port=", "unix=", "jobs="])
+	for opt, arg in opts:
+		if opt in ("-H", "--host"):
+			host = arg
+		elif opt in ("-p", "--port"):
+			port = int(arg)
+		elif opt in ("-u", "--unix"):
+			unixPath = arg
+		elif opt in ("-j", "--jobs"):
+			jobs = int(arg)
+
+	server = PentagoServer(jobs)
+	print("Pentago server on " + (unixPath if unixPath else host + ":" + str(port)) + \
+	      ", " + str(jobs) + " search processes")
+	try:
+		asyncio.run(server.serve(host, port, unixPath))
+	except KeyboardInterrupt:
+		pass
+	finally:
+		server.shutdown()
@@ -0,0 +1,28 @@
+#---------------------------------------------------------------------------
+# book.py and OpeningBook: every position of a built book has a legal move,
+# in each of its symmetric forms.
+#---------------------------------------------------------------------------
+
+import Pentago
+import book
+
+
+def test_book_moves_are_legal(tmp_path):
+	fileName = str(tmp_path / "book.bin")
+	entries = book.buildBook(1, 1)
+	book.writeBook(fileName, entries, 1)
+	openingBook = Pentago.OpeningBook(fileName)
+	positions = book.bookPositions(1)
+	assert len(openingBook)==len(entries)==len(positions)
+	for black, white, token in positions:
+		for t in range(Pentago.NUM_SYMMETRIES):
+			board = Pentago.PentagoBitboard()
+			board.black = Pentago.transformBits(black, t)
+			board.white = Pentago.transformBits(white, t)
+			board.emptyCells = Pentago.NUM_CELLS - bin(board.black | board.white).count("1")
+			found = openingBook.lookup(board.black, board.white, token)
+			assert found is not None
+			assert found[0] in board.getMoveCodes()
+	# a position past the book
+	board = Pentago.PentagoBitboard("bw" + "b" + "." * 33)
+	assert openingBook.lookup(board.black, board.white, "w") is None
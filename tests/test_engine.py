@@ -0,0 +1,46 @@
+#---------------------------------------------------------------------------
+# engine.py: the position, go and stop commands.
+#---------------------------------------------------------------------------
+
+import io
+import time
+import Pentago
+import engine
+
+
+def runCommands(e, lines):
+	for line in lines:
+		assert e.command(line)
+
+
+def test_go_depth_sends_info_and_a_legal_bestmove():
+	out = io.StringIO()
+	e = engine.Engine(out)
+	runCommands(e, [ "uci", "isready", "position startpos moves 1/1 1L 4/9 2R", "go depth 2" ])
+	e.searchThread.join()
+	lines = out.getvalue().splitlines()
+	assert "uciok" in lines and "readyok" in lines
+	assert [ line.split()[2] for line in lines if line.startswith("info depth") ]==[ "1", "2" ]
+	assert lines[-1].startswith("bestmove ")
+	board = Pentago.PentagoBitboard()
+	board.makeMove("1/1 1L", "b")
+	board.makeMove("4/9 2R", "w")
+	assert e.token=="b" and e.board.toString()==board.toString()
+	assert lines[-1][len("bestmove "):] in board.getMoves()
+	e.command("quit")
+
+
+def test_stop_ends_go_infinite():
+	out = io.StringIO()
+	e = engine.Engine(out)
+	runCommands(e, [ "position startpos", "go infinite" ])
+	time.sleep(0.2)
+	assert e.searchThread.is_alive()
+	startTime = time.time()
+	e.command("stop")
+	assert time.time() - startTime < 10
+	assert e.searchThread is None
+	lines = out.getvalue().splitlines()
+	assert lines[-1].startswith("bestmove ")
+	assert lines[-1][len("bestmove "):] in Pentago.PentagoBitboard().getMoves()
+	assert not e.command("quit")
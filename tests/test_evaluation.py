@@ -0,0 +1,105 @@
+#---------------------------------------------------------------------------
+# The subgrid tables, the incremental terms of PentagoBitboard,
+# batchHeuristic() and Search.evaluate() against Player.nwp28_h().
+#---------------------------------------------------------------------------
+
+import random
+import numpy as np
+import Pentago
+
+PLAYERS = { token: Pentago.Player("test", "computer", token) for token in ("b", "w") }
+
+
+def randomString(rng):
+#---------------------------------------------------------------------------
+# A random 36-char board; any mix of stones, since nwp28_h() does not care
+# whether the position could come up in a game.
+#---------------------------------------------------------------------------
+	weights = rng.choice([ (1, 1, 1), (3, 1, 1), (1, 2, 2), (6, 1, 1) ])
+	return "".join(rng.choices(".bw", weights=weights, k=36))
+
+
+def test_table_scores_match_nwp28_h():
+	rng = random.Random(22)
+	strings = [ randomString(rng) for n in range(5000) ]
+	for token, player in PLAYERS.items():
+		expected = [ player.nwp28_h(Pentago.PentagoBoard(s)) for s in strings ]
+		boards = [ Pentago.PentagoBitboard(s) for s in strings ]
+		bits = [ board.black if token=="b" else board.white for board in boards ]
+		assert [ Pentago.heuristicBits(b) for b in bits ]==expected
+		assert [ board.evaluate(token) for board in boards ]==expected
+		for board in boards:
+			board.enableEvaluation()
+		assert [ board.evaluate(token) for board in boards ]==expected
+		chars = np.array([ list(s) for s in strings ])
+		assert Pentago.batchHeuristic(chars, token).tolist()==expected
+		pairs = [ (board.black, board.white) for board in boards ]
+		assert Pentago.batchHeuristic(pairs, token).tolist()==expected
+		assert player.nwp28_hBatch(pairs).tolist()==expected
+
+
+def checkTerms(board):
+	# makeMove() keeps the terms of each color in a list
+	assert [ tuple(terms) for terms in board.evalTerms ]== \
+	       [ Pentago.colorTerms(board.black), Pentago.colorTerms(board.white) ]
+	for token, player in PLAYERS.items():
+		assert board.evaluate(token)==player.nwp28_h(board)
+
+
+def test_terms_follow_make_and_unmake():
+	rng = random.Random(23)
+	for game in range(100):
+		board = Pentago.PentagoBitboard()
+		board.enableEvaluation()
+		token = "b"
+		undos = [ ]
+		while not Pentago.isGameOver(board):
+			before = (board.black, board.white, board.evalTerms)
+			undos.append((board.makeMove(rng.choice(board.getMoveCodes()), token), before))
+			checkTerms(board)
+			token = "w" if token=="b" else "b"
+		for undo, before in reversed(undos):
+			board.unmakeMove(undo)
+			assert (board.black, board.white, board.evalTerms)==before
+
+
+def test_terms_follow_copies_and_rotations():
+	rng = random.Random(24)
+	for n in range(300):
+		board = Pentago.PentagoBitboard(randomString(rng))
+		board.enableEvaluation()
+		checkTerms(board.copy())
+		gameBlock = rng.randrange(1, 5)
+		board.rotateLeft(gameBlock)
+		checkTerms(board)
+		board.rotateRight(rng.randrange(1, 5))
+		checkTerms(board)
+		checkTerms(board.canonical()[0])
+		if board.emptyCells > 0:
+			move = Pentago.moveToString(rng.choice(board.getMoveCodes()))
+			checkTerms(board.playMove(move, rng.choice("bw"))[0])
+
+
+def test_incremental_search_checks_nwp28_h():
+	# with DEBUG_EVAL, every leaf score is checked against nwp28_h
+	rng = random.Random(25)
+	Pentago.DEBUG_EVAL = True
+	try:
+		searched = 0
+		while searched < 3:
+			board = Pentago.PentagoBitboard()
+			token = "b"
+			for ply in range(rng.randrange(4, 12)):
+				board = board.playMove(Pentago.moveToString(rng.choice(board.getMoveCodes())), token)[0]
+				token = "w" if token=="b" else "b"
+			if Pentago.isGameOver(board):
+				continue
+			search = Pentago.Search(PLAYERS[token], Pentago.TranspositionTable())
+			search.incrementalEval = True
+			move, score = search.search(board.copy(), 2)
+			plain = Pentago.Search(PLAYERS[token], Pentago.TranspositionTable())
+			plain.incrementalEval = False
+			assert (move, score)==plain.search(board.copy(), 2)
+			searched += 1
+	finally:
+		Pentago.DEBUG_EVAL = False
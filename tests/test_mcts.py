@@ -0,0 +1,40 @@
+#---------------------------------------------------------------------------
+# MCTSPlayer: playout and time budgets, tree reuse between moves.
+#---------------------------------------------------------------------------
+
+import pytest
+import Pentago
+import mcts
+
+
+def playReply(player, board):
+#---------------------------------------------------------------------------
+# Play the opponent's reply that the player's tree explored most.
+#---------------------------------------------------------------------------
+	reply = max(player.root.children, key=lambda child: child.visits)
+	board.makeMove(reply.move, reply.mover)
+
+
+@pytest.mark.parametrize("settings", [ { "playouts": "1500" }, { "movetime": "500" } ])
+def test_moves_are_legal_and_tree_is_reused(settings):
+	player = Pentago.makePlayer("M", "mcts", "b")
+	player.configure(dict(settings, seed="3"))
+	board = Pentago.PentagoBitboard()
+	for n in range(3):
+		move = player.getComputerMove(board)
+		assert move in board.getMoves()
+		assert player.lastStats.nodes >= 1
+		board.makeMove(move, "b")
+		playReply(player, board)
+	assert player.treeReuses==2
+
+
+def test_at_least_one_playout():
+	player = mcts.MCTSPlayer("M", "computer", "b")
+	with pytest.raises(ValueError):
+		player.configure({ "playouts": "0" })
+	# a budget used up before the first playout
+	player.configure({ "movetime": "1" })
+	player.moveTime = 1e-9
+	board = Pentago.PentagoBitboard()
+	assert player.getComputerMove(board) in board.getMoves()
@@ -0,0 +1,139 @@
+#---------------------------------------------------------------------------
+# Game record files: random games written and read back, appending,
+# truncated files, and text transcripts converted to records.
+#---------------------------------------------------------------------------
+
+import os
+import random
+import subprocess
+import sys
+import pytest
+import Pentago
+import records
+
+
+def randomRecord(rng, withStats):
+#---------------------------------------------------------------------------
+# A GameRecord of a random game, finished or not.
+#---------------------------------------------------------------------------
+	board = Pentago.PentagoBitboard()
+	players = [ ("Black ä", "computer", "b"), ("White", "human", "w") ]
+	plies = [ ]
+	stats = [ ] if withStats else None
+	token = "b"
+	for n in range(rng.randrange(0, 37)):
+		move = rng.choice(board.getMoveCodes())
+		plies.append((board.black, board.white, move))
+		if withStats:
+			# seconds that a 32-bit float keeps exactly
+			stats.append((rng.randrange(0, 8), rng.randrange(0, 100000), rng.randrange(0, 64) / 16))
+		board.makeMove(move, token)
+		token = "w" if token=="b" else "b"
+		if Pentago.isGameOver(board):
+			break
+	result = Pentago.findWinnerBits(board.black, board.white)
+	if result is None and board.emptyCells==0:
+		result = "tie"
+	return records.GameRecord(players, plies, (board.black, board.white), result, stats, \
+	                          1700000000.0 + rng.random())
+
+
+def recordFields(record):
+	return (record.players, record.plies, record.final, record.result, record.stats, \
+	        record.timestamp)
+
+
+def test_random_games_round_trip(tmp_path):
+	rng = random.Random(25)
+	games = [ randomRecord(rng, n % 3==0) for n in range(50) ]
+	fileName = str(tmp_path / "games.pgr")
+	# appending to the file with a second writer, small buffers
+	for part in (games[:20], games[20:]):
+		writer = records.GameRecordWriter(fileName, bufferSize=256)
+		for game in part:
+			writer.writeGame(game)
+		writer.close()
+	read = list(records.readGameRecords(fileName))
+	assert [ recordFields(r) for r in read ]==[ recordFields(g) for g in games ]
+	assert read[1].moves()==[ Pentago.moveToString(m) for b, w, m in games[1].plies ]
+
+
+def test_truncated_and_foreign_files(tmp_path):
+	rng = random.Random(26)
+	games = [ randomRecord(rng, True) for n in range(3) ]
+	fileName = tmp_path / "games.pgr"
+	writer = records.GameRecordWriter(str(fileName))
+	for game in games:
+		writer.writeGame(game)
+	writer.close()
+	data = fileName.read_bytes()
+	fileName.write_bytes(data[:-3])
+	read = [ ]
+	with pytest.raises(ValueError):
+		for record in records.readGameRecords(str(fileName)):
+			read.append(record)
+	assert [ recordFields(r) for r in read ]==[ recordFields(g) for g in games[:2] ]
+	other = tmp_path / "other.txt"
+	other.write_text("not a record file\n")
+	with pytest.raises(ValueError):
+		list(records.readGameRecords(str(other)))
+	with pytest.raises(ValueError):
+		records.GameRecordWriter(str(other))
+
+
+def test_transcript_with_stats_converts(tmp_path):
+	# a transcript as Pentago.py writes it with --stats: the stats column on
+	# the computer's moves only
+	rng = random.Random(27)
+	players = [ Pentago.Player("Ann", "computer", "b"), Pentago.Player("Bob", "human", "w") ]
+	board = Pentago.PentagoBitboard()
+	lines = [ "", str(players[0]), str(players[1]) ]
+	expected = [ ]
+	n = 0
+	while not Pentago.isGameOver(board):
+		move = Pentago.moveToString(rng.choice(board.getMoveCodes()))
+		line = board.toString() + "\t" + move
+		if n % 2==0:
+			stats = Pentago.SearchStats()
+			stats.depth = 2
+			stats.nodes = 1000 + n
+			stats.elapsed = 0.125
+			line += "\t" + str(stats)
+			expected.append((2, 1000 + n, 0.125))
+		else:
+			expected.append((0, 0, 0.0))
+		lines.append(line)
+		board = board.playMove(move, players[n % 2].token)[0]
+		n += 1
+	lines.append(board.toString() + "\t")
+	transcript = tmp_path / "transcript_1700000000.5.txt"
+	transcript.write_text("\n".join(lines) + "\n")
+
+	record = records.readTranscript(str(transcript))
+	assert record.players==[ ("Ann", "computer", "b"), ("Bob", "human", "w") ]
+	assert len(record.plies)==n and record.stats==expected
+	assert record.final==(board.black, board.white)
+	assert record.timestamp==1700000000.5
+	output = str(tmp_path / "games.pgr")
+	assert records.convert(output, [ str(transcript) ])==1
+	assert [ recordFields(r) for r in records.readGameRecords(output) ]==[ recordFields(record) ]
+
+
+def test_pentago_script_writes_both_formats(tmp_path):
+	# the same depth-1 game played by Pentago.py, as a transcript with stats
+	# and as a record
+	script = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Pentago.py")
+	config = tmp_path / "config.txt"
+	config.write_text("A\ncomputer\nb\nB\ncomputer\nw\ndepth=1\n")
+	for options in ([ "-s" ], [ "--record", "games.pgr" ]):
+		subprocess.run([ sys.executable, script, "-c", str(config) ] + options, cwd=str(tmp_path), \
+		               check=True, stdout=subprocess.DEVNULL, timeout=300)
+	transcripts = list(tmp_path.glob("transcript_*.txt"))
+	assert len(transcripts)==1
+	converted = records.readTranscript(str(transcripts[0]))
+	recorded = list(records.readGameRecords(str(tmp_path / "games.pgr")))
+	assert len(recorded)==1
+	assert converted.result is not None
+	assert (recorded[0].players, recorded[0].plies, recorded[0].final, recorded[0].result)== \
+	       (converted.players, converted.plies, converted.final, converted.result)
+	assert all(entry[1] > 0 for entry in converted.stats)
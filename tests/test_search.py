@@ -0,0 +1,171 @@
+#---------------------------------------------------------------------------
+# parallelSearch() against the serial testNegamax(), EndgameSolver against
+# plain minimax to the end of the game, searches in threads, pondering.
+#---------------------------------------------------------------------------
+
+import random
+import threading
+import Pentago
+
+
+def opponentOf(token):
+	return "w" if token=="b" else "b"
+
+
+def randomPosition(rng, plies):
+#---------------------------------------------------------------------------
+# (board string, token to move) after plies random moves, or None if the
+# game ended on the way.
+#---------------------------------------------------------------------------
+	board = Pentago.PentagoBitboard()
+	token = "b"
+	for n in range(plies):
+		board.makeMove(rng.choice(board.getMoveCodes()), token)
+		if Pentago.isGameOver(board):
+			return None
+		token = opponentOf(token)
+	return board.toString(), token
+
+
+def test_parallel_search_matches_test_negamax():
+	rng = random.Random(10)
+	checked = 0
+	while checked < 6:
+		position = randomPosition(rng, rng.randrange(24, 30))
+		if position is None:
+			continue
+		boardString, token = position
+		player = Pentago.Player("test", "computer", token)
+		depth = 1 + checked % 3
+		move, score = player.testNegamax(Pentago.PentagoBoard(boardString), opponentOf(token), \
+		                                 0, depth, -player.INFINITY, player.INFINITY, None, 1)
+		result = Pentago.parallelSearch(player, Pentago.PentagoBitboard(boardString), depth, 2)
+		assert (Pentago.moveToString(result[0]), result[1])==(move, score)
+		checked += 1
+
+
+def solveByMinimax(board, token):
+#---------------------------------------------------------------------------
+# 1, 0 or -1 for token to move: every line played out to the end.
+#---------------------------------------------------------------------------
+	best = -1
+	for m in board.getMoveCodes():
+		undo = board.makeMove(m, token)
+		winner = Pentago.findWinnerBits(board.black, board.white)
+		if winner is None:
+			value = 0 if board.emptyCells==0 else -solveByMinimax(board, opponentOf(token))
+		elif winner=="tie":
+			value = 0
+		else:
+			value = 1 if winner==token else -1
+		board.unmakeMove(undo)
+		best = max(best, value)
+		if best==1:
+			break
+	return best
+
+
+def test_endgame_solver_matches_minimax():
+	rng = random.Random(20)
+	solver = Pentago.EndgameSolver()
+	results = set()
+	checked = 0
+	while checked < 60:
+		position = randomPosition(rng, 36 - rng.randrange(1, 6))
+		if position is None:
+			continue
+		boardString, token = position
+		board = Pentago.PentagoBitboard(boardString)
+		move, result = solver.solve(board, token)
+		assert board.toString()==boardString
+		assert result==solveByMinimax(board, token)
+		# the move reaches the result
+		undo = board.makeMove(move, token)
+		winner = Pentago.findWinnerBits(board.black, board.white)
+		if winner is None:
+			value = 0 if board.emptyCells==0 else -solveByMinimax(board, opponentOf(token))
+		else:
+			value = 0 if winner=="tie" else 1 if winner==token else -1
+		board.unmakeMove(undo)
+		assert value==result
+		results.add(result)
+		checked += 1
+	assert len(results) > 1
+
+
+def test_hash_move_of_symmetric_position_comes_first():
+	# a position symmetric about its diagonal: the hash move stored under
+	# the mirrored position is not itself in the uniqueMoves() list
+	board = Pentago.PentagoBitboard("b....." + "." * 30)
+	black, white, t, symmetries = Pentago.canonicalBits(board.black, board.white)
+	assert len(symmetries) > 1
+	moveList = Pentago.uniqueMoves(board.getMoveCodes(), symmetries)
+	search = Pentago.Search(Pentago.Player("test", "computer", "w"), Pentago.TranspositionTable())
+	for m in board.getMoveCodes():
+		if m in moveList:
+			continue
+		ordered = search.orderMoves(board, moveList, m, 0, "w", 1, symmetries)
+		assert ordered[0]==Pentago.representativeMove(m, symmetries)
+		assert ordered[0] in moveList
+
+
+def test_search_deeper_than_the_board():
+	player = Pentago.Player("test", "computer", "b")
+	# a full board without a winner, and one empty cell
+	full = Pentago.PentagoBitboard("bbwwbb" "wwbbww" "bbwwbb" "wwbbww" "bbwwbb" "wwbbww")
+	assert Pentago.findWinnerBits(full.black, full.white) is None
+	search = Pentago.Search(player, Pentago.TranspositionTable())
+	move, score = search.search(full, 3)
+	assert move is None
+	oneLeft = Pentago.PentagoBitboard("." + full.toString()[1:])
+	for useSymmetry in (False, True):
+		search = Pentago.Search(player, Pentago.TranspositionTable(), useSymmetry=useSymmetry)
+		move, score = search.search(oneLeft.copy(), 4)
+		assert move in oneLeft.getMoveCodes()
+	# moves that leave nothing to search
+	search = Pentago.Search(player, Pentago.TranspositionTable())
+	search.rootMoves = [ ]
+	assert search.search(oneLeft.copy(), 2)[0] is None
+
+
+def test_searches_in_threads_match_serial_searches():
+	rng = random.Random(14)
+	positions = [ ]
+	while len(positions) < 4:
+		position = randomPosition(rng, rng.randrange(6, 20))
+		if position is not None:
+			positions.append(position)
+	def runSearch(boardString, token):
+		player = Pentago.Player("test", "computer", token)
+		search = Pentago.Search(player, Pentago.TranspositionTable())
+		return search.iterativeDeepening(Pentago.PentagoBitboard(boardString), 2)
+	serial = [ runSearch(*position) for position in positions ]
+	threaded = [ None ] * len(positions)
+	def worker(n):
+		threaded[n] = runSearch(*positions[n])
+	threads = [ threading.Thread(target=worker, args=(n,)) for n in range(len(positions)) ]
+	for thread in threads:
+		thread.start()
+	for thread in threads:
+		thread.join()
+	assert threaded==serial
+
+
+def test_ponder_hit_uses_the_pondered_result():
+	player = Pentago.Player("test", "computer", "b")
+	player.configure({ "depth": "2", "ponder": "1", "threats": "0" })
+	board = Pentago.PentagoBitboard("b" + "." * 12 + "w" + "." * 22)
+	move = player.getComputerMove(board)
+	assert player.ponderThread is not None
+	player.ponderThread.join()
+	ponderBoard, (ponderMove, ponderScore), ponderDepth = player.ponderResult
+	assert ponderDepth==2
+	# the opponent plays the expected reply: the pondered move is played
+	# without searching again
+	nodes = player.ponderSearch.stats.nodes
+	nextMove = player.getComputerMove(Pentago.PentagoBitboard(ponderBoard))
+	assert player.ponderHits==1
+	assert nextMove==Pentago.moveToString(ponderMove)
+	assert player.lastStats.depth==2 and player.lastStats.nodes==0
+	assert nodes > 0
+	player.close()
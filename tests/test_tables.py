@@ -0,0 +1,54 @@
+#---------------------------------------------------------------------------
+# TranspositionTable and PersistentTable counters and clear(), and the
+# ttsize setting.
+#---------------------------------------------------------------------------
+
+import pytest
+import Pentago
+
+COUNTERS = [ "probes", "hits", "cutoffs", "stores", "overwrites" ]
+
+
+def fillTable(tt):
+	# three positions of one index: the shallower two share the second slot
+	for key in range(1, 40):
+		tt.store(key, 4, Pentago.EXACT, None, key)
+		tt.store(key + tt.size, 2, Pentago.LOWER, None, -key)
+		tt.store(key + 2*tt.size, 1, Pentago.UPPER, None, -key)
+	for key in range(1, 80):
+		tt.probe(key)
+	tt.cutoffs += 3
+
+
+def test_clear_resets_entries_and_counters():
+	tt = Pentago.TranspositionTable(64)
+	fillTable(tt)
+	assert all(tt.stats()[name] > 0 for name in COUNTERS)
+	tt.clear()
+	assert all(tt.stats()[name]==0 for name in COUNTERS)
+	assert tt.probe(1) is None
+
+
+def test_persistent_table_clear_keeps_the_file(tmp_path):
+	fileName = str(tmp_path / "table.tt")
+	tt = Pentago.PersistentTable(fileName, "b", slots=256, size=64)
+	fillTable(tt)
+	tt.flush()
+	tt.clear()
+	assert all(tt.stats()[name]==0 for name in COUNTERS + [ "fileHits" ])
+	assert tt.probe(1)[4]==1
+	# a file hit is kept in memory, but is not a store
+	assert tt.stats()["fileHits"]==1 and tt.stats()["stores"]==0
+	assert tt.probe(1)[4]==1 and tt.stats()["fileHits"]==1
+
+
+def test_ttsize_setting_sizes_the_table():
+	player = Pentago.Player("test", "computer", "b")
+	player.configure({ "ttsize": "1024", "depth": "1" })
+	player.getComputerMove(Pentago.PentagoBitboard())
+	assert player.tt.size==1024
+	player.configure({ "ttsize": "2048" })
+	player.getComputerMove(Pentago.PentagoBitboard())
+	assert player.tt.size==2048
+	with pytest.raises(ValueError):
+		player.configure({ "ttsize": "0" })
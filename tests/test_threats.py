@@ -0,0 +1,202 @@
+#---------------------------------------------------------------------------
+# winningMove(), ThreatSearch.forcedWin() and ThreatSearch.safeMoves()
+# against brute-force search over every move and reply.
+#---------------------------------------------------------------------------
+
+import random
+import Pentago
+import mcts
+
+
+def opponentOf(token):
+	return "w" if token=="b" else "b"
+
+
+def randomBoard(rng, plies):
+#---------------------------------------------------------------------------
+# The board after plies random moves from the empty board, Black first, or
+# None if the game ended on the way.
+#---------------------------------------------------------------------------
+	board = Pentago.PentagoBitboard()
+	token = "b"
+	for n in range(plies):
+		board.makeMove(rng.choice(board.getMoveCodes()), token)
+		if Pentago.isGameOver(board):
+			return None
+		token = opponentOf(token)
+	return board
+
+
+def winsAtOnce(board, token):
+#---------------------------------------------------------------------------
+# The moves of token after which token alone has 5 in a row.
+#---------------------------------------------------------------------------
+	moves = [ ]
+	for m in board.getMoveCodes():
+		undo = board.makeMove(m, token)
+		if Pentago.findWinnerBits(board.black, board.white)==token:
+			moves.append(m)
+		board.unmakeMove(undo)
+	return moves
+
+
+def winsWithin2(board, token, move):
+#---------------------------------------------------------------------------
+# True if move wins at once, or every reply loses at once or leaves token a
+# move that wins at once.
+#---------------------------------------------------------------------------
+	opponent = opponentOf(token)
+	undo = board.makeMove(move, token)
+	winner = Pentago.findWinnerBits(board.black, board.white)
+	if winner is not None or board.emptyCells==0:
+		board.unmakeMove(undo)
+		return winner==token
+	wins = True
+	for r in board.getMoveCodes():
+		replyUndo = board.makeMove(r, opponent)
+		winner = Pentago.findWinnerBits(board.black, board.white)
+		if winner is None:
+			wins = board.emptyCells > 0 and len(winsAtOnce(board, token)) > 0
+		else:
+			wins = winner==token
+		board.unmakeMove(replyUndo)
+		if not wins:
+			break
+	board.unmakeMove(undo)
+	return wins
+
+
+def safeByBruteForce(board, token):
+	opponent = opponentOf(token)
+	safe = [ ]
+	for m in board.getMoveCodes():
+		undo = board.makeMove(m, token)
+		winner = Pentago.findWinnerBits(board.black, board.white)
+		if winner is None:
+			if board.emptyCells==0 or not winsAtOnce(board, opponent):
+				safe.append(m)
+		elif winner!=opponent:
+			safe.append(m)
+		board.unmakeMove(undo)
+	return safe
+
+
+def winningMoveOf(board, token):
+	empty = ~(board.black | board.white) & Pentago.FULL_MASK
+	if token=="b":
+		return Pentago.winningMove(board.black, board.white, empty)
+	return Pentago.winningMove(board.white, board.black, empty)
+
+
+def test_winning_move_matches_brute_force():
+	rng = random.Random(24)
+	checked = 0
+	while checked < 300:
+		board = randomBoard(rng, rng.randrange(6, 30))
+		if board is None:
+			continue
+		for token in ("b", "w"):
+			wins = winsAtOnce(board, token)
+			move = winningMoveOf(board, token)
+			if wins:
+				assert move in wins
+			else:
+				assert move is None
+		checked += 1
+
+
+def test_forced_win_in_two_known_position():
+	# Black makes an open four in the top row, and White cannot stop both ends
+	board = Pentago.PentagoBitboard(".bbb.." + "." * 6 + "..w..." + "...w.." + "." * 12)
+	assert not winsAtOnce(board, "b")
+	found = Pentago.ThreatSearch().forcedWin(board, "b", 2)
+	assert found is not None
+	move, n = found
+	assert n==2 and winsWithin2(board, "b", move)
+
+
+def test_forced_win_matches_brute_force():
+	rng = random.Random(25)
+	search = Pentago.ThreatSearch()
+	wins = 0
+	checked = 0
+	while checked < 20:
+		board = randomBoard(rng, rng.randrange(10, 24))
+		if board is None:
+			continue
+		token = "b" if board.emptyCells % 2==0 else "w"
+		found = search.forcedWin(board, token, 2)
+		if found is None:
+			# no first move that keeps a threat wins
+			for m in board.getMoveCodes():
+				undo = board.makeMove(m, token)
+				threat = Pentago.findWinnerBits(board.black, board.white) is None and \
+				         winsAtOnce(board, token)
+				board.unmakeMove(undo)
+				assert not (threat and winsWithin2(board, token, m))
+		else:
+			move, n = found
+			assert winsWithin2(board, token, move)
+			if n==2:
+				assert not winsAtOnce(board, token)
+			wins += 1
+		checked += 1
+	assert wins > 0
+
+
+def test_safe_moves_match_brute_force():
+	rng = random.Random(26)
+	search = Pentago.ThreatSearch()
+	threatened = 0
+	checked = 0
+	while checked < 100:
+		board = randomBoard(rng, rng.randrange(8, 30))
+		if board is None:
+			continue
+		token = "b" if board.emptyCells % 2==0 else "w"
+		safe = search.safeMoves(board, token)
+		if winsAtOnce(board, opponentOf(token)):
+			assert safe is not None
+			assert sorted(safe)==sorted(safeByBruteForce(board, token))
+			threatened += 1
+		else:
+			assert safe is None
+		checked += 1
+	assert threatened > 0
+
+
+def test_mcts_player_only_plays_safe_moves():
+	# Black threatens to complete the top row in several ways; White has a
+	# few moves that stop them all, and an mcts player must play one
+	board = Pentago.PentagoBitboard("wbbbb." + "." * 6 + "..w..." + "...w.." + "." * 12)
+	safe = Pentago.ThreatSearch().safeMoves(board, "w")
+	assert len(safe) > 1
+	player = mcts.MCTSPlayer("M", "computer", "w")
+	player.configure({ "playouts": "50", "threats": "1", "seed": "1" })
+	assert Pentago.moveFromString(player.getComputerMove(board)) in safe
+	assert player.blockMoves==safe
+
+	# the same, in a tree kept from the mcts player's previous move
+	rng = random.Random(27)
+	reused = 0
+	for game in range(10):
+		player = mcts.MCTSPlayer("M", "computer", "w")
+		player.configure({ "playouts": "400", "threats": "1", "seed": str(game) })
+		board = Pentago.PentagoBitboard("wbbb.." + "." * 6 + "..w..." + "...w.." + "." * 12)
+		board.makeMove(Pentago.moveFromString(player.getComputerMove(board)), "w")
+		# a reply the tree explored that leaves White several safe moves
+		replies = [ child.move for child in player.root.children ]
+		rng.shuffle(replies)
+		for m in replies:
+			undo = board.makeMove(m, "b")
+			safe = Pentago.ThreatSearch().safeMoves(board, "w")
+			if not Pentago.isGameOver(board) and safe is not None and len(safe) > 1 and \
+			   Pentago.ThreatSearch().forcedWin(board, "w", 1) is None:
+				break
+			board.unmakeMove(undo)
+		else:
+			continue
+		reuses = player.treeReuses
+		assert Pentago.moveFromString(player.getComputerMove(board)) in safe
+		reused += player.treeReuses - reuses
+	assert reused > 0
@@ -0,0 +1,131 @@
+#!/usr/bin/python
+
+#---------------------------------------------------------------------------
+# Pentago transposition table files
+# Inspect or compact the files that players keep their transposition table
+# in between games (--ttfile file, or ttfile=file in the config).
+#
+#   python3 ttfile.py [-i] file
+#   python3 ttfile.py -c [-s slots] file
+#
+# Options:
+#   -i, --inspect   print the header, the slots in use, and entries by depth
+#                   and bound (the default)
+#   -c, --compact   rewrite the file with the given number of slots (default:
+#                   the same number), dropping damaged slots; when entries
+#                   meet in one slot the deeper one is kept.  With the same
+#                   number of slots the file is rewritten in place, and
+#                   running games keep using it; a resized file is a new
+#                   file, which they only see once restarted.
+#   -s, --slots     number of slots for --compact
+#---------------------------------------------------------------------------
+
+import sys, getopt
+import os
+import mmap
+import zlib
+import json
+import Pentago
+
+
+def readEntries(data):
+#---------------------------------------------------------------------------
+# The valid slots of a mapped table file, as (key, depth, bound, move,
+# score) with keys as stored (salted); and the number of damaged slots.
+#---------------------------------------------------------------------------
+	slots = Pentago.readTableHeader(data, "table")
+	entries = [ ]
+	damaged = 0
+	for slot in range(slots):
+		offset = Pentago.TT_FILE_HEADER.size + slot*Pentago.TT_FILE_ENTRY.size
+		raw = data[offset:offset+Pentago.TT_FILE_ENTRY.size]
+		if raw.count(0)==len(raw):
+			continue
+		key, depth, bound, move, score, check = Pentago.TT_FILE_ENTRY.unpack(raw)
+		if check!=zlib.crc32(raw[:Pentago.TT_FILE_CHECKED]) or key % slots!=slot:
+			damaged += 1
+			continue
+		entries.append((key, depth, bound, move, score))
+	return entries, damaged
+
+
+def inspect(fileName):
+	f = open(fileName, "rb")
+	data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+	slots = Pentago.readTableHeader(data, fileName)
+	entries, damaged = readEntries(data)
+	data.close()
+	f.close()
+	byDepth = { }
+	byBound = { "exact": 0, "lower": 0, "upper": 0 }
+	boundNames = { Pentago.EXACT: "exact", Pentago.LOWER: "lower", Pentago.UPPER: "upper" }
+	for key, depth, bound, move, score in entries:
+		byDepth[depth] = byDepth.get(depth, 0) + 1
+		byBound[boundNames.get(bound, "lower")] += 1
+	return { "file": fileName, "version": Pentago.TT_FILE_VERSION, "slots": slots, \
+	         "bytes": os.path.getsize(fileName), "used": len(entries), \
+	         "fill": round(len(entries)/slots, 4), "damaged": damaged, \
+	         "byDepth": { str(depth): byDepth[depth] for depth in sorted(byDepth) }, \
+	         "byBound": byBound }
+
+
+def compact(fileName, slots=None):
+#---------------------------------------------------------------------------
+# Rewrite fileName with its valid entries, under the writers' lock.
+# Returns (entries kept, entries dropped).
+#---------------------------------------------------------------------------
+	f = open(fileName, "r+b")
+	if Pentago.fcntl is not None:
+		Pentago.fcntl.flock(f.fileno(), Pentago.fcntl.LOCK_EX)
+	try:
+		data = mmap.mmap(f.fileno(), 0)
+		oldSlots = Pentago.readTableHeader(data, fileName)
+		entries, damaged = readEntries(data)
+		if slots is None:
+			slots = oldSlots
+		table = { }
+		for entry in sorted(entries, key=lambda entry: entry[1]):
+			table[entry[0] % slots] = entry
+		empty = bytes(Pentago.TT_FILE_ENTRY.size)
+		body = b"".join(Pentago.packTableEntry(*table[slot]) if slot in table else empty \
+		                for slot in range(slots))
+		if slots==oldSlots:
+			data[Pentago.TT_FILE_HEADER.size:] = body
+			data.flush()
+			data.close()
+		else:
+			data.close()
+			tempName = fileName + "." + str(os.getpid()) + ".tmp"
+			out = open(tempName, "wb")
+			out.write(Pentago.TT_FILE_HEADER.pack(Pentago.TT_FILE_MAGIC, \
+			              Pentago.TT_FILE_VERSION, Pentago.TT_FILE_ENTRY.size, slots))
+			out.write(body)
+			out.close()
+			os.replace(tempName, fileName)
+	finally:
+		if Pentago.fcntl is not None:
+			Pentago.fcntl.flock(f.fileno(), Pentago.fcntl.LOCK_UN)
+		f.close()
+	return len(table), len(entries) - len(table) + damaged
+
+
+if __name__ == "__main__":
+	doCompact = False
+	slots = None
+	opts, args = getopt.getopt(sys.argv[1:], "ics:", ["inspect", "compact", "slots="])
+	for opt, arg in opts:
+		if opt in ("-i", "--inspect"):
+			doCompact = False
+		elif opt in ("-c", "--compact"):
+			doCompact = True
+		elif opt in ("-s", "--slots"):
+			slots = int(arg)
+	if len(args)!=1:
+		print("Usage: python3 ttfile.py [-i | -c [-s slots]] file")
+		sys.exit(2)
+
+	if doCompact:
+		kept, dropped = compact(args[0], slots)
+		print(args[0] + ": " + str(kept) + " entries kept, " + str(dropped) + " dropped")
+	else:
+		print(json.dumps(inspect(args[0]), indent=2))